@@ -0,0 +1,179 @@
+"""
+Serverless adapter for the Django WSGI application.
+
+A serverless invocation passes the HTTP request as an event dict and
+expects a dict with statusCode, headers and body back. This module
+converts the event into a WSGI environ in one pass, with the body wrapped
+in a BytesIO stream. It calls the application and captures the status and
+headers passed to start_response. The response iterable is joined into
+the body and then closed, which is what lets Django close its database
+connections.
+
+Both event shapes we receive are understood:
+
+- Vercel style: method, path, query, headers, body
+- API Gateway style: httpMethod or requestContext.http.method, rawPath,
+  rawQueryString, multiValueQueryStringParameters or
+  queryStringParameters, headers, body
+
+isBase64Encoded marks a base64 request body. Response bodies that are
+not UTF-8 text are returned base64 encoded in the same way.
+"""
+import base64
+import io
+import sys
+from urllib.parse import unquote_to_bytes, urlencode
+
+# Response content types returned as text; anything else is base64 encoded
+TEXT_CONTENT_TYPES = (
+    'text/', 'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+)
+
+# Request headers that WSGI passes without the HTTP_ prefix
+UNPREFIXED_HEADERS = {'content-type': 'CONTENT_TYPE', 'content-length': 'CONTENT_LENGTH'}
+
+
+def _method(event):
+    return (
+        event.get('method')
+        or event.get('httpMethod')
+        or event.get('requestContext', {}).get('http', {}).get('method')
+        or 'GET'
+    ).upper()
+
+
+def _path_and_query(event):
+    path = event.get('rawPath') or event.get('path') or '/'
+    query = event.get('rawQueryString')
+    if query is None:
+        # API Gateway keeps only the last value of a repeated parameter in
+        # queryStringParameters; the multi-value form has all of them
+        query = event.get('query') or event.get('multiValueQueryStringParameters') or event.get('queryStringParameters')
+    if isinstance(query, dict):
+        query = urlencode(query, doseq=True)
+
+    path, _, path_query = path.partition('?')
+    return path, query or path_query
+
+
+def _body(event):
+    body = event.get('body') or b''
+    if event.get('isBase64Encoded'):
+        return base64.b64decode(body)
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return body
+
+
+def event_to_environ(event):
+    """Build the WSGI environ for a serverless event"""
+    headers = event.get('headers') or {}
+    path, query = _path_and_query(event)
+    body = _body(event)
+
+    environ = {
+        'REQUEST_METHOD': _method(event),
+        'SCRIPT_NAME': '',
+        # WSGI carries the undecoded bytes of the path as a latin-1 string
+        'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '443',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'https',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.input_terminated': True,
+    }
+
+    for name, value in headers.items():
+        name = name.lower()
+        if isinstance(value, (list, tuple)):
+            value = ','.join(value)
+        if name == 'content-length':
+            # The decoded body length set above is authoritative
+            continue
+        key = UNPREFIXED_HEADERS.get(name) or 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = value
+
+    host = environ.get('HTTP_HOST')
+    if host:
+        environ['SERVER_NAME'], _, port = host.partition(':')
+        environ['SERVER_PORT'] = port or environ['SERVER_PORT']
+    forwarded_proto = environ.get('HTTP_X_FORWARDED_PROTO')
+    if forwarded_proto:
+        environ['wsgi.url_scheme'] = forwarded_proto.split(',')[0].strip()
+    forwarded_for = environ.get('HTTP_X_FORWARDED_FOR') or environ.get('HTTP_X_REAL_IP')
+    if forwarded_for:
+        environ['REMOTE_ADDR'] = forwarded_for.split(',')[0].strip()
+
+    return environ
+
+
+def _is_text(headers):
+    content_type = next((value for name, value in headers if name.lower() == 'content-type'), '')
+    return content_type.startswith(TEXT_CONTENT_TYPES)
+
+
+def call_application(application, environ):
+    """Run a WSGI application, returning (status code, header list, body bytes)"""
+    started = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        if exc_info and started:
+            raise exc_info[1].with_traceback(exc_info[2])
+        started['status'] = status
+        started['headers'] = headers
+        return written.append
+
+    result = application(environ, start_response)
+    try:
+        # join returns a single chunk as is, so the usual one chunk body is not copied
+        body = b''.join(result)
+        if written:
+            body = b''.join(written) + body
+    finally:
+        close = getattr(result, 'close', None)
+        if close is not None:
+            close()
+
+    return int(started['status'].split(' ', 1)[0]), started['headers'], body
+
+
+def to_response(status_code, headers, body):
+    """Convert a WSGI response into the serverless response dict"""
+    single = {}
+    multi = {}
+    for name, value in headers:
+        if name in single:
+            multi.setdefault(name, [single[name]]).append(value)
+        single[name] = value
+
+    response = {'statusCode': status_code, 'headers': single}
+    if multi:
+        # Repeated headers such as Set-Cookie
+        response['multiValueHeaders'] = multi
+
+    if _is_text(headers) or not body:
+        try:
+            response['body'] = body.decode('utf-8')
+            response['isBase64Encoded'] = False
+            return response
+        except UnicodeDecodeError:
+            pass
+    response['body'] = base64.b64encode(body).decode('ascii')
+    response['isBase64Encoded'] = True
+    return response
+
+
+def make_handler(application):
+    """Return a serverless handler(event, context) for a WSGI application"""
+    def handler(event, context=None, **kwargs):
+        return to_response(*call_application(application, event_to_environ(event)))
+    return handler
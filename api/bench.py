@@ -0,0 +1,72 @@
+"""
+Local benchmark for the serverless adapter.
+
+Replays serverless events from a JSONL file (one event per line, in the
+shape the adapter accepts) through vercel_app.handler in process and
+reports latency percentiles and throughput per event:
+
+    python -m api.bench events.jsonl --repeat 200
+
+Each line may also carry a "name" key used to label it in the report.
+Events run against the database configured by DATABASE_URL, so point it
+at a scratch database when replaying writes.
+"""
+import argparse
+import json
+import statistics
+import time
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(handler, events, repeat, warmup):
+    """Return a list of (label, status codes, latencies in ms) per event"""
+    results = []
+    for index, event in enumerate(events):
+        label = event.get('name') or f"{event.get('method', event.get('httpMethod', 'GET'))} {event.get('path', event.get('rawPath', '/'))}"
+        for _ in range(warmup):
+            handler(event, None)
+
+        statuses = set()
+        latencies = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = handler(event, None)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.add(response['statusCode'])
+        results.append((label, sorted(statuses), latencies))
+    return results
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('events', help='JSONL file of serverless events')
+    parser.add_argument('--repeat', type=int, default=100, help='Timed calls per event')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed calls per event before timing')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    from vercel_app import handler
+    startup = (time.perf_counter() - started) * 1000
+    print(f"startup {startup:.1f} ms")
+
+    results = replay(handler, load_events(args.events), args.repeat, args.warmup)
+    print(f"{'event':40} {'status':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for label, statuses, latencies in results:
+        print(
+            f"{label[:40]:40} {','.join(map(str, statuses)):>10} "
+            f"{statistics.median(latencies):8.2f} {percentile(latencies, 0.95):8.2f} "
+            f"{percentile(latencies, 0.99):8.2f} {1000 * len(latencies) / sum(latencies):8.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
-from api.wsgi_handler import handler
+from vercel_app import handler
+
 
 def lambda_handler(event, context):
-    return handler(event, context) 
\ No newline at end of file
+    return handler(event, context)
@@ -1,5 +1,2 @@
-from bright_credit.wsgi import application
-
-# This is the handler that Vercel uses for serverless functions
-def handler(request, **kwargs):
-    return application(request.environ, lambda x, y: []) 
\ No newline at end of file
+# Kept for deployments that still import the handler from here
+from vercel_app import handler, application
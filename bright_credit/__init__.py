@@ -1,11 +1,27 @@
 from __future__ import absolute_import, unicode_literals
 
+import os
+
 # This will make sure the app is always imported when
 # Django starts so that shared_task will use this app.
-try:
-    from .celery import app as celery_app
-    __all__ = ('celery_app',)
-except ImportError:
-    # Celery not installed, provide dummy implementation
-    celery_app = None
-    __all__ = ()
+# With LAZY_IMPORTS=True (serverless cold starts) Celery is only
+# imported by load_celery_app, the first time a task is queued.
+celery_app = None
+__all__ = ()
+
+
+def load_celery_app():
+    """Import the Celery app if it is not loaded yet; returns None without Celery"""
+    global celery_app, __all__
+    if celery_app is None:
+        try:
+            from .celery import app as celery_app
+            __all__ = ('celery_app',)
+        except ImportError:
+            # Celery not installed, provide dummy implementation
+            pass
+    return celery_app
+
+
+if os.getenv('LAZY_IMPORTS', 'False') != 'True':
+    load_celery_app()
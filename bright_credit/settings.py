@@ -11,8 +11,12 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 import dj_database_url
+import django
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -47,25 +51,26 @@ INSTALLED_APPS = [
     'credit_service',
 ]
 
+# Optional apps are detected without importing them; the app registry
+# imports the ones that are installed
 # Add Vercel adapter
-try:
-    import django_vercel
+if find_spec('django_vercel'):
     INSTALLED_APPS.append('django_vercel')
-except ImportError:
-    pass
 
 # Optional apps that require additional dependencies
-try:
-    import rest_framework
+if find_spec('rest_framework'):
     INSTALLED_APPS.append('rest_framework')
-except ImportError:
-    pass
 
-try:
-    import django_celery_results
+# Defer heavy imports (Celery, pandas, NumPy) until a request needs them;
+# meant for serverless deployments where every cold start pays for them
+LAZY_IMPORTS = os.getenv('LAZY_IMPORTS', 'False') == 'True'
+# Import time a lazy cold start of vercel_app may take; checked by the test suite
+COLD_START_BUDGET_MS = float(os.getenv('COLD_START_BUDGET_MS', '1000'))
+
+# The result backend app imports Celery; lazy web processes never read task
+# results, so it is left out there. Run migrations without LAZY_IMPORTS.
+if find_spec('django_celery_results') and not LAZY_IMPORTS:
     INSTALLED_APPS.append('django_celery_results')
-except ImportError:
-    pass
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -78,6 +83,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Set by bright_credit/asgi.py
+ASGI = os.getenv('DJANGO_ASGI', 'False') == 'True'
+
 ROOT_URLCONF = 'bright_credit.urls'
 
 TEMPLATES = [
@@ -114,11 +122,54 @@ else:
     DATABASES = {
         'default': dj_database_url.config(
             default='sqlite:///db.sqlite3',
-            conn_max_age=600,
+            # Persistent connections are per thread, which ASGI does not reuse
+            conn_max_age=0 if ASGI else 600,
             conn_health_checks=True,
         )
     }
 
+# PostgreSQL connection pooling
+# DB_POOL_MODE selects how connections are reused:
+# - 'none': one persistent connection per thread (CONN_MAX_AGE above)
+# - 'psycopg': a psycopg 3 connection pool in each process; Django checks a
+#   connection out per request or task and returns it at the end
+# - 'pgbouncer': connect through PgBouncer in transaction pooling mode, so
+#   server side cursors and prepared statements are turned off
+# Both modes keep select_for_update safe: the batch tasks take their locks
+# inside transaction.atomic, and a transaction always runs on one server
+# connection from BEGIN to COMMIT.
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', 'none')
+# 'web' or 'worker' (set in the Procfile); selects the pool size below
+PROCESS_ROLE = os.getenv('PROCESS_ROLE', 'web')
+# Web processes need one connection per thread; prefork Celery children run one task at a time
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '4' if PROCESS_ROLE == 'web' else '2'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', '300'))  # Seconds before idle connections are closed
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    db_options = DATABASES['default'].setdefault('OPTIONS', {})
+    # Lets pg_stat_activity and db_pool_stats tell web and worker connections apart
+    db_options.setdefault('application_name', f'bright_credit-{PROCESS_ROLE}')
+    if DB_POOL_MODE == 'psycopg':
+        if django.VERSION < (5, 1):
+            raise ImproperlyConfigured("DB_POOL_MODE=psycopg needs Django 5.1 or later")
+        # Django requires persistent connections to be off when pooling
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        db_options['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': DB_POOL_MAX_IDLE,
+        }
+    elif DB_POOL_MODE == 'pgbouncer':
+        # Named cursors and prepared statements do not survive the server
+        # connection changing between transactions
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+        if find_spec('psycopg'):
+            # Only psycopg 3 prepares statements; psycopg2 rejects the option
+            db_options['prepare_threshold'] = None
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -166,7 +217,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Celery Configuration
 # For Vercel deployment, Celery will be dummy implementations
 CELERY_BROKER_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
-CELERY_RESULT_BACKEND = 'django-db'
+# The django-db backend needs django_celery_results. Lazy web processes leave
+# it out and only queue tasks, so they run without a result backend
+CELERY_RESULT_BACKEND = 'django-db' if 'django_celery_results' in INSTALLED_APPS else None
 CELERY_CACHE_BACKEND = 'default'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_TASK_TRACK_STARTED = True
@@ -184,6 +237,73 @@ LATE_PAYMENT_FEE = Decimal('500')
 MIN_DUE_PERCENTAGE = Decimal('5')
 MIN_MONTHLY_INTEREST = Decimal('50')
 MAX_EMI_PERCENTAGE_OF_INCOME = Decimal('20')
+MIN_CREDIT_SCORE_FOR_LOAN = 450
+MIN_ANNUAL_INCOME = Decimal('150000')
+MAX_LOAN_AMOUNT = Decimal('5000')
+MAX_ACTIVE_LOANS_PER_USER = None  # None disables the limit
+MAX_OUTSTANDING_PRINCIPAL = None  # Active principal plus the new loan; None disables the limit
+IDEMPOTENCY_KEY_TTL_HOURS = 24  # How long responses are kept for Idempotency-Key replays
+IDEMPOTENCY_LEASE_SECONDS = 60  # How long a request holds its Idempotency-Key before a retry may take it over
+
+# Transactions file used for credit scoring
+TRANSACTION_CSV_PATH = os.getenv('TRANSACTION_CSV_PATH', os.path.join(BASE_DIR, 'data', 'transactions.csv'))
+TRANSACTION_CSV_CHUNK_SIZE = 100000  # Rows parsed per chunk when ingesting the transactions file
+# Where credit scoring reads balances from: 'ledger' (TransactionAggregate table)
+# or 'columnar' (memory-mapped NumPy cache in TRANSACTION_CACHE_DIR)
+TRANSACTION_BALANCE_BACKEND = os.getenv('TRANSACTION_BALANCE_BACKEND', 'ledger')
+TRANSACTION_CACHE_DIR = os.getenv('TRANSACTION_CACHE_DIR', os.path.join(BASE_DIR, 'data', 'cache', 'transactions'))
+CREDIT_SCORE_BATCH_SIZE = 1000  # Users scored per bulk_update in score_users_batch
+REGISTRATION_BATCH_SIZE = 1000  # Users checked and inserted per chunk by bulk-register-users
+LOAN_IMPORT_BATCH_SIZE = 1000  # Loans checked and inserted per transaction by the import_loans command
+EXPORT_CHUNK_SIZE = 2000  # Rows fetched per server-side cursor round trip by the ledger exports
+# 'daily' writes one InterestAccrual row per loan per day; 'events' computes
+# billing interest in closed form from BalanceEvent rows instead
+INTEREST_ENGINE = os.getenv('INTEREST_ENGINE', 'daily')
+ACCRUAL_BATCH_SIZE = 1000  # Loans locked and accrued per transaction in accrue_daily_interest
+BILLING_BATCH_SIZE = 1000  # Due loans locked and billed per transaction in run_daily_billing_batch
+LOAN_SHARD_SIZE = 10000  # Active loans per shard task in the sharded accrual and billing tasks
+
+# SQLite profile for single node deployments (the default and Vercel databases)
+# - WAL lets API reads proceed while a batch task writes
+# - BEGIN IMMEDIATE takes the write lock when a transaction starts, so writers
+#   queue on busy_timeout instead of failing with "database is locked" when a
+#   read lock cannot be upgraded
+# - batch writers commit in smaller chunks so no write lock is held for long
+SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True') == 'True'
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))  # Seconds a writer waits for the lock
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # Bytes of the file memory-mapped
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))  # Page cache per connection
+SQLITE_WRITE_BATCH_SIZE = 250  # Largest chunk a batch writer commits at once
+SQLITE_WRITE_PAUSE = float(os.getenv('SQLITE_WRITE_PAUSE', '0.05'))  # Seconds batch writers yield the lock between chunks
+
+# Applied to every new connection by credit_service.sqlite_tuning
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': SQLITE_MMAP_SIZE,
+    'cache_size': -SQLITE_CACHE_SIZE_KB,
+    'temp_store': 'MEMORY',
+}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Tests use a file instead of the shared in-memory database, where
+    # concurrent writers fail with "table is locked" instead of waiting.
+    # The PID keeps two test runs on one machine from sharing the file.
+    DATABASES['default'].setdefault('TEST', {}).setdefault(
+        'NAME', os.path.join(tempfile.gettempdir(), f'bright_credit_test_{os.getpid()}.sqlite3')
+    )
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and SQLITE_TUNING:
+    DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = SQLITE_BUSY_TIMEOUT
+    # Older Django passes unknown options to sqlite3.connect, which rejects
+    # this one; credit_service.sqlite_tuning issues BEGIN IMMEDIATE there
+    if django.VERSION >= (5, 1):
+        DATABASES['default']['OPTIONS']['transaction_mode'] = 'IMMEDIATE'
+    ACCRUAL_BATCH_SIZE = min(ACCRUAL_BATCH_SIZE, SQLITE_WRITE_BATCH_SIZE)
+    BILLING_BATCH_SIZE = min(BILLING_BATCH_SIZE, SQLITE_WRITE_BATCH_SIZE)
+    CREDIT_SCORE_BATCH_SIZE = min(CREDIT_SCORE_BATCH_SIZE, SQLITE_WRITE_BATCH_SIZE)
+    LOAN_IMPORT_BATCH_SIZE = min(LOAN_IMPORT_BATCH_SIZE, SQLITE_WRITE_BATCH_SIZE)
+    REGISTRATION_BATCH_SIZE = min(REGISTRATION_BATCH_SIZE, SQLITE_WRITE_BATCH_SIZE)
 
 # Security Settings
 if not DEBUG:
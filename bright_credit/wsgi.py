@@ -19,5 +19,5 @@ application = get_wsgi_application()
 app = application
 
 # For vercel handler to import
-def handler(request, **kwargs):
-    return app(request.environ, lambda x, y: [])
+from api.adapter import make_handler
+handler = make_handler(application)
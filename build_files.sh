@@ -9,4 +9,7 @@ rm -rf staticfiles
 mkdir -p staticfiles
 python3 manage.py collectstatic --noinput --clear
 
+echo "Building transaction cache..."
+python3 manage.py build_transaction_cache
+
 echo "Build completed successfully." 
\ No newline at end of file
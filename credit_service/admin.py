@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Loan, Billing, Payment, InterestAccrual
+from .models import User, Loan, Billing, Payment, InterestAccrual, TransactionAggregate
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -31,3 +31,8 @@ class InterestAccrualAdmin(admin.ModelAdmin):
     list_display = ('loan', 'accrual_date', 'principal_balance', 'daily_interest_rate', 'interest_amount')
     list_filter = ('accrual_date',)
     search_fields = ('loan__loan_id',)
+
+@admin.register(TransactionAggregate)
+class TransactionAggregateAdmin(admin.ModelAdmin):
+    list_display = ('aadhar_id', 'total_credit', 'total_debit', 'transaction_count', 'updated_at')
+    search_fields = ('aadhar_id',)
@@ -6,4 +6,13 @@ class CreditServiceConfig(AppConfig):
     name = 'credit_service'
     
     def ready(self):
-        import credit_service.tasks  # noqa
\ No newline at end of file
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from .sqlite_tuning import apply_sqlite_pragmas
+        
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='credit_service.sqlite_pragmas')
+        
+        # Celery workers load the tasks through autodiscovery; with lazy
+        # imports the web process imports them when it first queues one
+        if not settings.LAZY_IMPORTS:
+            import credit_service.tasks  # noqa
\ No newline at end of file
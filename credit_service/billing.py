@@ -0,0 +1,104 @@
+"""
+Bulk billing engine.
+
+Due loans are billed in chunks: each chunk locks its loans with
+SKIP LOCKED, sums the cycle's interest for all of them with one grouped
+aggregate (or one BalanceEvent query with the 'events' interest engine),
+bulk-creates the Billing rows, links the accruals to their bills with one
+UPDATE and moves the loans to their next billing date. Several
+workers can run the engine at once; each one skips the loans another worker
+has locked.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from .models import Loan, Billing, InterestAccrual, minimum_due_for
+from .interest import interest_for_loans
+from .statements import invalidate_statements
+from .sqlite_tuning import pause_between_writes
+
+
+def bill_due_loans(billing_date, loans=None, batch_size=None):
+    """
+    Generate the billings due on billing_date for every active loan.
+
+    loans optionally narrows the Loan queryset (e.g. to a range of loan IDs).
+    Billed loans move on to their next billing date and drop out of the
+    selection, so running the engine again for the same day bills nothing.
+    Returns aggregate counts.
+    """
+    batch_size = batch_size or settings.BILLING_BATCH_SIZE
+    due_loans = (loans if loans is not None else Loan.objects.all()).filter(
+        status='ACTIVE', next_billing_date=billing_date
+    ).order_by('loan_id')
+    
+    due_date = billing_date + datetime.timedelta(days=15)
+    next_billing_date = billing_date + datetime.timedelta(days=30)
+    # Same 30 day window as generate_billing_for_loan
+    start_date = billing_date - datetime.timedelta(days=29)
+    
+    counts = {"loans_billed": 0}
+    while True:
+        with transaction.atomic():
+            rows = list(
+                due_loans.select_for_update(skip_locked=True)
+                .values_list('loan_id', 'principal_balance', 'interest_rate')[:batch_size]
+            )
+            if not rows:
+                break
+            
+            loan_ids = [loan_id for loan_id, _, _ in rows]
+            window_accruals = InterestAccrual.objects.filter(
+                loan_id__in=loan_ids,
+                billing__isnull=True,
+                accrual_date__gte=start_date,
+                accrual_date__lte=billing_date
+            )
+            if settings.INTEREST_ENGINE == 'events':
+                interest_totals = interest_for_loans(
+                    [(loan_id, interest_rate) for loan_id, _, interest_rate in rows],
+                    start_date,
+                    billing_date
+                )
+            else:
+                interest_totals = dict(
+                    window_accruals.order_by().values('loan_id')
+                    .annotate(total=Sum('interest_amount'))
+                    .values_list('loan_id', 'total')
+                )
+            
+            billings = []
+            for loan_id, principal_balance, _ in rows:
+                total_interest = interest_totals.get(loan_id) or Decimal('0')
+                billings.append(Billing(
+                    loan_id=loan_id,
+                    billing_date=billing_date,
+                    due_date=due_date,
+                    principal_amount=principal_balance,
+                    interest_amount=total_interest,
+                    minimum_due=minimum_due_for(principal_balance, total_interest),
+                    total_due=principal_balance + total_interest
+                ))
+            Billing.objects.bulk_create(billings, batch_size=batch_size)
+            
+            # Link every accrual to the bill created for its loan
+            window_accruals.update(billing=Subquery(
+                Billing.objects.filter(loan_id=OuterRef('loan_id'), billing_date=billing_date)
+                .values('billing_id')[:1]
+            ))
+            
+            Loan.objects.filter(loan_id__in=loan_ids).update(
+                next_billing_date=next_billing_date,
+                updated_at=timezone.now()
+            )
+            invalidate_statements(loan_ids)
+        
+        counts["loans_billed"] += len(rows)
+        pause_between_writes()
+    
+    return counts
@@ -0,0 +1,118 @@
+"""
+Loan eligibility rules.
+
+Everything the rules look at is loaded with one annotated query per
+applicant (or per batch of applicants): the user row, the number of active
+loans and the principal outstanding on them. The rules themselves are a
+declarative table of checks driven by the settings constants, so adding a
+rule never adds a query.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import User
+
+Rule = namedtuple('Rule', ['name', 'check', 'message'])
+
+
+def estimated_emi(application):
+    """First month's EMI: 3% of the principal plus one month of simple interest"""
+    return application['loan_amount'] * Decimal('0.03') + monthly_interest(application)
+
+
+def monthly_interest(application):
+    return application['loan_amount'] * application['interest_rate'] / Decimal('100') / Decimal('12')
+
+
+def _within_limit(value, limit):
+    # A limit of None disables the rule
+    return limit is None or value <= limit
+
+
+# Evaluated in order; the first failing rule's message is reported.
+# Messages are formatted with the settings module.
+RULES = [
+    Rule(
+        'credit_score',
+        lambda user, application: bool(user.credit_score) and user.credit_score >= settings.MIN_CREDIT_SCORE_FOR_LOAN,
+        "Credit score is too low or not available",
+    ),
+    Rule(
+        'annual_income',
+        lambda user, application: user.annual_income >= settings.MIN_ANNUAL_INCOME,
+        "Annual income does not meet minimum requirements",
+    ),
+    Rule(
+        'loan_amount',
+        lambda user, application: application['loan_amount'] <= settings.MAX_LOAN_AMOUNT,
+        "Loan amount exceeds maximum allowed amount of {settings.MAX_LOAN_AMOUNT}",
+    ),
+    Rule(
+        'interest_rate',
+        lambda user, application: application['interest_rate'] >= settings.MIN_INTEREST_RATE,
+        "Interest rate must be at least {settings.MIN_INTEREST_RATE}%",
+    ),
+    Rule(
+        'loan_type',
+        lambda user, application: application['loan_type'] == 'CC',
+        "Only Credit Card loans are supported at this time",
+    ),
+    Rule(
+        'active_loans',
+        lambda user, application: _within_limit(user.active_loan_count + 1, settings.MAX_ACTIVE_LOANS_PER_USER),
+        "User already has the maximum of {settings.MAX_ACTIVE_LOANS_PER_USER} active loans",
+    ),
+    Rule(
+        'outstanding_principal',
+        lambda user, application: _within_limit(
+            user.outstanding_principal + application['loan_amount'], settings.MAX_OUTSTANDING_PRINCIPAL
+        ),
+        "Total outstanding principal would exceed {settings.MAX_OUTSTANDING_PRINCIPAL}",
+    ),
+    Rule(
+        'emi_to_income',
+        lambda user, application: estimated_emi(application)
+        <= user.annual_income / Decimal('12') * settings.MAX_EMI_PERCENTAGE_OF_INCOME / Decimal('100'),
+        "Monthly EMI exceeds {settings.MAX_EMI_PERCENTAGE_OF_INCOME}% of monthly income",
+    ),
+    Rule(
+        'monthly_interest',
+        lambda user, application: monthly_interest(application) >= settings.MIN_MONTHLY_INTEREST,
+        "Monthly interest must be at least {settings.MIN_MONTHLY_INTEREST}",
+    ),
+]
+
+
+def applicants():
+    """Users annotated with active_loan_count and outstanding_principal"""
+    active = Q(loans__status='ACTIVE')
+    return User.objects.annotate(
+        active_loan_count=Count('loans', filter=active),
+        outstanding_principal=Coalesce(
+            Sum('loans__principal_balance', filter=active),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+    )
+
+
+def load_applicant(user_id):
+    """Return the annotated user, or None if it does not exist"""
+    return applicants().filter(unique_user_id=user_id).first()
+
+
+def check_eligibility(user, application):
+    """
+    Evaluate RULES for an annotated user and a loan application.
+
+    application holds loan_type, loan_amount, interest_rate and term_period.
+    Returns the message of the first failing rule, or None if eligible.
+    """
+    for rule in RULES:
+        if not rule.check(user, application):
+            return rule.message.format(settings=settings)
+    return None
@@ -0,0 +1,117 @@
+"""
+Streaming ledger exports for reconciliation.
+
+Each export reads one table ordered by (date, primary key) with
+values_list and QuerySet.iterator, so rows are fetched from a server-side
+cursor in chunks of EXPORT_CHUNK_SIZE and never become model instances.
+Memory use does not depend on the size of the table. A pull that stopped
+part way is resumed by passing the date and ID of the last row received
+as after_date and after_id.
+"""
+import csv
+import datetime
+import io
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import Loan, Billing, Payment, InterestAccrual
+
+Export = namedtuple('Export', ['model', 'date_field', 'columns'])
+
+# The first column is the primary key and the second the keyset date
+EXPORTS = {
+    'loans': Export(Loan, 'disbursement_date', [
+        'loan_id', 'disbursement_date', 'user_id', 'loan_type', 'loan_amount', 'interest_rate',
+        'term_period', 'principal_balance', 'status', 'next_billing_date',
+    ]),
+    'billings': Export(Billing, 'billing_date', [
+        'billing_id', 'billing_date', 'loan_id', 'due_date', 'principal_amount', 'interest_amount',
+        'minimum_due', 'total_due', 'is_paid',
+    ]),
+    'payments': Export(Payment, 'payment_date', [
+        'payment_id', 'payment_date', 'loan_id', 'billing_id', 'amount', 'principal_payment', 'interest_payment',
+    ]),
+    'interest-accruals': Export(InterestAccrual, 'accrual_date', [
+        'id', 'accrual_date', 'loan_id', 'principal_balance', 'daily_interest_rate', 'interest_amount', 'billing_id',
+    ]),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+
+class ExportError(Exception):
+    pass
+
+
+def parse_cursor(table, after_date=None, after_id=None):
+    """Validate an export name and its resume cursor, returning (export, after_date, after_id)"""
+    export = EXPORTS.get(table)
+    if export is None:
+        raise ExportError(f"Unknown export '{table}'; expected one of {', '.join(EXPORTS)}")
+    try:
+        if after_date:
+            after_date = datetime.date.fromisoformat(after_date)
+        if after_id:
+            after_id = int(after_id) if export.model is InterestAccrual else uuid.UUID(after_id)
+    except ValueError:
+        raise ExportError("after_date must be YYYY-MM-DD and after_id a valid ID")
+    if after_id and not after_date:
+        raise ExportError("after_id requires after_date")
+    return export, after_date or None, after_id or None
+
+
+def export_rows(export, after_date=None, after_id=None, limit=None, chunk_size=None):
+    """Yield value tuples of the export's columns in (date, ID) order, starting after the cursor"""
+    if limit is not None and limit < 0:
+        raise ExportError("limit must not be negative")
+    pk = export.columns[0]
+    rows = export.model.objects.order_by(export.date_field, pk)
+    if after_date and after_id:
+        rows = rows.filter(Q(**{f'{export.date_field}__gt': after_date})
+                           | Q(**{export.date_field: after_date, f'{pk}__gt': after_id}))
+    elif after_date:
+        rows = rows.filter(**{f'{export.date_field}__gt': after_date})
+    rows = rows.values_list(*export.columns)
+    if limit:
+        rows = rows[:limit]
+    return rows.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+
+
+def render_ndjson(columns, rows):
+    """Yield one JSON object per row"""
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def render_csv(columns, rows):
+    """Yield a header line followed by one CSV line per row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only reached for an empty export, where the header was not yielded yet
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def render(export, rows, file_format, lines_per_chunk=None):
+    """Yield the rendered export in chunks of lines, so the response is not written one row at a time"""
+    renderer = render_csv if file_format == 'csv' else render_ndjson
+    lines_per_chunk = lines_per_chunk or settings.EXPORT_CHUNK_SIZE
+    chunk = []
+    for line in renderer(export.columns, rows):
+        chunk.append(line)
+        if len(chunk) >= lines_per_chunk:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,123 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+The first request with a given key reserves it, runs the view and stores
+the response. A retry with the same key and body gets the stored response
+back without running the view again; a retry that arrives while the first
+request is still running gets a 409.
+
+The view and the storing of its response run in one transaction, so a
+request either commits both its writes and its response or neither. A
+reservation is a lease of IDEMPOTENCY_LEASE_SECONDS: if the process dies
+before committing, the key expires with the lease and a retry runs the
+view again. A request that outlives its lease and finds that a retry has
+taken the key over is rolled back instead of committing twice.
+"""
+import datetime
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+
+def _reserve(endpoint, key, request_hash):
+    """Return (reservation, None) for a new reservation, or (None, existing live row) for the key"""
+    for retry in (True, False):
+        now = timezone.now()
+        lease_expires_at = now + datetime.timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+        
+        # Expired keys and abandoned reservations can be reused
+        IdempotencyKey.objects.filter(endpoint=endpoint, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                reservation = IdempotencyKey.objects.create(
+                    endpoint=endpoint, key=key, request_hash=request_hash, expires_at=lease_expires_at
+                )
+            return reservation, None
+        except IntegrityError:
+            pass
+        
+        try:
+            return None, IdempotencyKey.objects.get(endpoint=endpoint, key=key)
+        except IdempotencyKey.DoesNotExist:
+            # The holder released the key (after a server error) between the
+            # insert and this read, so the key is free again
+            if not retry:
+                raise
+
+
+class LeaseExpired(Exception):
+    """A retry took the key over while the view was running"""
+
+
+def idempotent(endpoint):
+    """
+    Decorate a DRF view's post method with Idempotency-Key handling.
+    
+    Requests without the header are processed as usual.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view_method(self, request, *args, **kwargs)
+            
+            request_hash = hashlib.sha256(request.body).hexdigest()
+            reservation, existing = _reserve(endpoint, key, request_hash)
+            
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return Response(
+                        {"error": f"{HEADER} was already used for a different request"},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if existing.response_status is None:
+                    return Response(
+                        {"error": "A request with this Idempotency-Key is still being processed"},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                return Response(existing.response_body, status=existing.response_status,
+                                headers={'Idempotent-Replayed': 'true'})
+            
+            try:
+                with transaction.atomic():
+                    response = view_method(self, request, *args, **kwargs)
+                    if response.status_code < 500:
+                        stored = IdempotencyKey.objects.filter(
+                            pk=reservation.pk, response_status__isnull=True
+                        ).update(
+                            response_status=response.status_code,
+                            # Stored as rendered so replays are byte-for-byte the same JSON
+                            response_body=json.loads(JSONRenderer().render(response.data)),
+                            expires_at=timezone.now() + datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+                        )
+                        if not stored:
+                            raise LeaseExpired
+            except LeaseExpired:
+                return Response(
+                    {"error": f"The request outlived its {HEADER} lease and was rolled back; retry it"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            except Exception:
+                IdempotencyKey.objects.filter(pk=reservation.pk).delete()
+                raise
+            
+            if response.status_code >= 500:
+                # Let the client retry server errors
+                IdempotencyKey.objects.filter(pk=reservation.pk).delete()
+            return response
+        
+        return wrapper
+    return decorator
+
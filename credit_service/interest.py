@@ -0,0 +1,85 @@
+"""
+Event based interest engine.
+
+Instead of one InterestAccrual row per loan per day, interest is derived
+from the loan's BalanceEvent rows: the principal is constant between two
+events, so the interest over a date range is a sum over those constant
+segments of (days in segment x one day's interest). Each day's interest is
+rounded with daily_interest_for, exactly like the rows written by the
+daily accrual engine, so both engines give the same totals.
+
+Both engines charge a day's interest on the principal left after that
+day's payments: an event applies from its own date, and the daily engine
+re-prices the accruals of a payment's date (see accrual.restate_accruals).
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from .models import BalanceEvent, daily_interest_rate_for, daily_interest_for
+
+
+def interest_between(events, interest_rate, start_date, end_date):
+    """
+    Interest accrued from start_date to end_date (both inclusive).
+
+    events is a list of (event_date, principal_balance) sorted by date; an
+    event applies from its own date onwards and the principal before the
+    first event is zero.
+    """
+    if end_date < start_date:
+        return Decimal('0')
+
+    daily_rate = daily_interest_rate_for(interest_rate)
+    total = Decimal('0')
+    principal = Decimal('0')
+    segment_start = start_date
+
+    for event_date, principal_balance in events:
+        if event_date > end_date:
+            break
+        if event_date > segment_start:
+            days = (event_date - segment_start).days
+            total += days * daily_interest_for(principal, daily_rate)
+            segment_start = event_date
+        principal = principal_balance
+
+    days = (end_date - segment_start).days + 1
+    return total + days * daily_interest_for(principal, daily_rate)
+
+
+def loan_events(loan_ids, end_date):
+    """Return a dict of loan ID to its (event_date, principal_balance) list up to end_date"""
+    events = defaultdict(list)
+    rows = BalanceEvent.objects.filter(
+        loan_id__in=loan_ids, event_date__lte=end_date
+    ).order_by('loan_id', 'event_date', 'created_at', 'id').values_list('loan_id', 'event_date', 'principal_balance')
+    for loan_id, event_date, principal_balance in rows:
+        events[loan_id].append((event_date, principal_balance))
+    return events
+
+
+def interest_for_loans(loans, start_date, end_date):
+    """
+    Interest from start_date to end_date for many loans with one query.
+
+    loans is an iterable of (loan_id, interest_rate) pairs. Returns a dict
+    of loan ID to interest.
+    """
+    loans = list(loans)
+    events = loan_events([loan_id for loan_id, _ in loans], end_date)
+    return {
+        loan_id: interest_between(events.get(loan_id, []), interest_rate, start_date, end_date)
+        for loan_id, interest_rate in loans
+    }
+
+
+
+def record_payment_event(loan, payment_date, principal_paid):
+    """Record the principal reduction of a payment; loan.principal_balance must already be updated"""
+    return BalanceEvent.objects.create(
+        loan=loan,
+        event_date=payment_date,
+        event_type='PAYMENT',
+        amount=-principal_paid,
+        principal_balance=loan.principal_balance
+    )
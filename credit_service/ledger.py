@@ -0,0 +1,260 @@
+"""
+Per-Aadhaar transaction ledger.
+
+The transactions file is folded once into TransactionAggregate rows so that
+credit scoring is a primary-key lookup instead of a scan of the whole CSV.
+The file is streamed in chunks, so ingestion memory stays bounded by the
+chunk size and the number of distinct Aadhaar numbers.
+TransactionSource keeps the ingestion checkpoint: rows appended to the file
+are folded in incrementally, any other change to the file rebuilds the
+aggregates from scratch.
+pandas is imported when a file is actually read, not when the module is
+imported, so web processes that never ingest transactions do not load it.
+"""
+import hashlib
+import io
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import TransactionAggregate, TransactionSource
+
+CSV_COLUMNS = ['AADHAR_ID', 'Date', 'Amount', 'Transaction_type']
+
+# Number of bytes before the checkpoint that are hashed to detect rewrites
+CHECKPOINT_WINDOW = 1024
+
+BULK_BATCH_SIZE = 1000
+
+
+def normalize_aadhar(value):
+    """Aadhaar numbers are stored as 12 character strings"""
+    return str(value).strip().zfill(12)
+
+
+def _checkpoint_digest(path, offset):
+    """Hash the bytes just before the checkpoint offset"""
+    start = max(0, offset - CHECKPOINT_WINDOW)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha1(f.read(offset - start)).hexdigest()
+
+
+def csv_dtypes():
+    """Compact dtypes for streaming ingestion; Date is not needed for scoring and is skipped"""
+    import pandas as pd
+    return {
+        'AADHAR_ID': 'int64',
+        'Amount': 'float64',
+        'Transaction_type': pd.CategoricalDtype(['CREDIT', 'DEBIT']),
+    }
+
+
+class _ByteRange(io.RawIOBase):
+    """Readable view of a file that stops after a fixed number of bytes"""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._remaining = length
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining)
+        if size <= 0:
+            return 0
+        data = self._f.read(size)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def iter_transaction_chunks(path, offset, end, chunk_size=None):
+    """
+    Stream the rows stored between offset and end in DataFrame chunks.
+
+    Only the columns used for scoring are parsed, with the compact dtypes
+    from csv_dtypes, so memory use depends on the chunk size and not on the
+    size of the file.
+    """
+    import pandas as pd
+
+    dtypes = csv_dtypes()
+    chunk_size = chunk_size or settings.TRANSACTION_CSV_CHUNK_SIZE
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        stream = io.BufferedReader(_ByteRange(f, end - offset))
+        options = {
+            'usecols': list(dtypes),
+            'dtype': dtypes,
+            'chunksize': chunk_size,
+        }
+        if offset != 0:
+            options.update(header=None, names=CSV_COLUMNS)
+
+        with pd.read_csv(stream, **options) as reader:
+            for chunk in reader:
+                yield chunk
+
+
+def aggregate_transactions(transactions_df):
+    """
+    Group transactions by Aadhaar number.
+
+    Returns a DataFrame indexed by the raw AADHAR_ID value with
+    total_credit, total_debit and transaction_count columns.
+    """
+    import pandas as pd
+
+    amounts = transactions_df['Amount']
+    transaction_types = transactions_df['Transaction_type']
+
+    frame = pd.DataFrame({
+        'AADHAR_ID': transactions_df['AADHAR_ID'],
+        'total_credit': amounts.where(transaction_types == 'CREDIT', 0.0),
+        'total_debit': amounts.where(transaction_types == 'DEBIT', 0.0),
+        'transaction_count': 1,
+    })
+    return frame.groupby('AADHAR_ID', sort=False).sum()
+
+
+def fold_transactions(chunks):
+    """
+    Fold a stream of transaction chunks into running per-Aadhaar totals.
+
+    Returns the aggregates indexed by normalized Aadhaar number and the
+    number of rows read. Only the running totals are kept between chunks.
+    """
+    totals = None
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        aggregates = aggregate_transactions(chunk)
+        totals = aggregates if totals is None else totals.add(aggregates, fill_value=0)
+
+    if totals is None:
+        import pandas as pd
+        totals = pd.DataFrame(columns=['total_credit', 'total_debit', 'transaction_count'])
+    totals.index = totals.index.map(normalize_aadhar)
+    return totals, rows
+
+
+def _starts_on_new_line(path, offset):
+    """Check that the data after offset does not continue the last ingested line"""
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        boundary = f.read(2)
+    return boundary[:1] in (b'\n', b'\r') or boundary[1:] in (b'\n', b'\r')
+
+
+def _to_decimal(value):
+    return Decimal(repr(float(value))).quantize(Decimal('0.01'))
+
+
+def _apply_aggregates(aggregates, replace):
+    """Write grouped totals to TransactionAggregate, adding to existing rows unless replace is set"""
+    if replace:
+        TransactionAggregate.objects.all().delete()
+        existing = {}
+    else:
+        existing = {}
+        keys = list(aggregates.index)
+        for start in range(0, len(keys), BULK_BATCH_SIZE):
+            existing.update(TransactionAggregate.objects.in_bulk(keys[start:start + BULK_BATCH_SIZE]))
+
+    to_create = []
+    to_update = []
+    for aadhar_id, row in aggregates.iterrows():
+        credit = _to_decimal(row['total_credit'])
+        debit = _to_decimal(row['total_debit'])
+        count = int(row['transaction_count'])
+
+        aggregate = existing.get(aadhar_id)
+        if aggregate is None:
+            to_create.append(TransactionAggregate(
+                aadhar_id=aadhar_id,
+                total_credit=credit,
+                total_debit=debit,
+                transaction_count=count
+            ))
+        else:
+            aggregate.total_credit += credit
+            aggregate.total_debit += debit
+            aggregate.transaction_count += count
+            to_update.append(aggregate)
+
+    TransactionAggregate.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    TransactionAggregate.objects.bulk_update(
+        to_update,
+        ['total_credit', 'total_debit', 'transaction_count'],
+        batch_size=BULK_BATCH_SIZE
+    )
+
+
+def refresh_ledger(path=None, force=False):
+    """
+    Bring TransactionAggregate up to date with the transactions file.
+
+    The file is only read when its size or mtime differ from the stored
+    checkpoint. If the file grew and the already ingested prefix is intact,
+    only the appended rows are folded in; otherwise the aggregates are rebuilt.
+    """
+    path = str(path or settings.TRANSACTION_CSV_PATH)
+    stat = os.stat(path)
+
+    source = TransactionSource.objects.filter(path=path).first()
+    if not force and source and source.size == stat.st_size and source.mtime == stat.st_mtime:
+        return {"status": "unchanged", "rows": 0}
+
+    with transaction.atomic():
+        source, _ = TransactionSource.objects.get_or_create(path=path)
+        source = TransactionSource.objects.select_for_update().get(pk=source.pk)
+
+        stat = os.stat(path)
+        if not force and source.size == stat.st_size and source.mtime == stat.st_mtime:
+            # Another worker refreshed the ledger while we were waiting for the lock
+            return {"status": "unchanged", "rows": 0}
+
+        incremental = (
+            not force
+            and 0 < source.offset < stat.st_size
+            and _checkpoint_digest(path, source.offset) == source.checkpoint_digest
+            and _starts_on_new_line(path, source.offset)
+        )
+        offset = source.offset if incremental else 0
+
+        aggregates, rows = fold_transactions(iter_transaction_chunks(path, offset, stat.st_size))
+        _apply_aggregates(aggregates, replace=not incremental)
+
+        source.size = stat.st_size
+        source.mtime = stat.st_mtime
+        source.offset = stat.st_size
+        source.checkpoint_digest = _checkpoint_digest(path, stat.st_size)
+        source.rows_ingested = (source.rows_ingested if incremental else 0) + rows
+        source.save()
+
+    return {"status": "appended" if incremental else "rebuilt", "rows": rows}
+
+
+def get_net_balance(aadhar_id):
+    """Return the CREDIT - DEBIT balance for an Aadhaar number, or None if it has no transactions"""
+    aggregate = TransactionAggregate.objects.filter(aadhar_id=normalize_aadhar(aadhar_id)).first()
+    if aggregate is None:
+        return None
+    return aggregate.net_balance()
+
+
+def get_net_balances(aadhar_ids):
+    """
+    Return a dict of normalized Aadhaar number to CREDIT - DEBIT balance.
+
+    Aadhaar numbers without transactions are left out of the result.
+    """
+    keys = {normalize_aadhar(aadhar_id) for aadhar_id in aadhar_ids}
+    rows = TransactionAggregate.objects.filter(aadhar_id__in=keys).values_list(
+        'aadhar_id', 'total_credit', 'total_debit'
+    )
+    return {aadhar_id: credit - debit for aadhar_id, credit, debit in rows}
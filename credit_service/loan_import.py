@@ -0,0 +1,199 @@
+"""
+Bulk loan import for portfolio migrations.
+
+Records are streamed from a CSV or NDJSON file and processed in chunks of
+LOAN_IMPORT_BATCH_SIZE. For each chunk the referenced users are fetched
+with one annotated query. The eligibility RULES are then evaluated in memory,
+and the accepted loans and their DISBURSEMENT events are written with one
+bulk_create each. bulk_create bypasses Loan.save, so next_billing_date and
+the balance events are filled in here. A record for a loan that already
+exists (same user, disbursement date and amount) is rejected, so running
+the same file again imports nothing twice.
+"""
+import csv
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .eligibility import applicants, check_eligibility
+from .models import Loan, BalanceEvent
+
+FIELDS = ['unique_user_id', 'loan_type', 'loan_amount', 'interest_rate', 'term_period', 'disbursement_date']
+
+# Numeric values are checked against their column (max_digits, integer range) before they reach the database
+NUMERIC_FIELDS = ['loan_amount', 'interest_rate', 'term_period', 'principal_balance']
+# Largest term_period a PostgreSQL integer column holds; Django before 5.0 does not bound it on SQLite
+MAX_TERM_PERIOD = 2147483647
+
+BILLING_CYCLE_DAYS = 30
+
+
+class LoanImportError(Exception):
+    pass
+
+
+def iter_loan_records(path, file_format=None):
+    """
+    Yield (row, record) pairs from a CSV or NDJSON file without loading it whole.
+
+    The format defaults to the file extension. Rows are numbered from 1;
+    a record that is not valid JSON is yielded as None.
+    """
+    file_format = file_format or ('csv' if str(path).endswith('.csv') else 'ndjson')
+    with open(path, newline='') as f:
+        if file_format == 'csv':
+            for row, record in enumerate(csv.DictReader(f), start=1):
+                yield row, record
+            return
+
+        row = 0
+        for line in f:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, json.loads(line)
+            except ValueError:
+                yield row, None
+
+
+def parse_loan_record(record):
+    """Convert a raw record into an application dict, raising LoanImportError if it is malformed"""
+    if not isinstance(record, dict):
+        raise LoanImportError("Invalid record")
+    missing = [field for field in FIELDS if record.get(field) in (None, '')]
+    if missing:
+        raise LoanImportError(f"Missing fields: {', '.join(missing)}")
+
+    try:
+        application = {
+            'unique_user_id': uuid.UUID(str(record['unique_user_id'])),
+            'loan_type': str(record['loan_type']),
+            'loan_amount': Decimal(str(record['loan_amount'])),
+            'interest_rate': Decimal(str(record['interest_rate'])),
+            'term_period': int(record['term_period']),
+            'disbursement_date': datetime.date.fromisoformat(str(record['disbursement_date'])),
+        }
+        # A migrated loan may already be partly repaid
+        principal_balance = record.get('principal_balance')
+        application['principal_balance'] = (
+            application['loan_amount'] if principal_balance in (None, '') else Decimal(str(principal_balance))
+        )
+    except (ValueError, ArithmeticError) as e:
+        raise LoanImportError(f"Invalid value: {e}")
+
+    for field in NUMERIC_FIELDS:
+        try:
+            Loan._meta.get_field(field).run_validators(application[field])
+        except ValidationError as e:
+            raise LoanImportError(f"Invalid {field}: {' '.join(e.messages)}")
+
+    if application['loan_amount'] <= 0 or application['term_period'] <= 0:
+        raise LoanImportError("loan_amount and term_period must be positive")
+    if application['term_period'] > MAX_TERM_PERIOD:
+        raise LoanImportError(f"Invalid term_period: must be at most {MAX_TERM_PERIOD}")
+    if not 0 <= application['principal_balance'] <= application['loan_amount']:
+        raise LoanImportError("principal_balance must be between 0 and loan_amount")
+    return application
+
+
+def next_billing_date_for(disbursement_date, as_of):
+    """First billing cycle date (every 30 days after disbursement) that is on or after as_of"""
+    cycles = max(1, -(-(as_of - disbursement_date).days // BILLING_CYCLE_DAYS))
+    return disbursement_date + datetime.timedelta(days=cycles * BILLING_CYCLE_DAYS)
+
+
+def _import_chunk(chunk, as_of, errors):
+    """Check and insert one chunk of (row, application) pairs, returning the number of loans created"""
+    user_ids = {application['unique_user_id'] for _, application in chunk}
+    users = applicants().in_bulk(user_ids)
+    # Loans from an earlier run of the same file, or earlier in this one
+    existing = set(Loan.objects.filter(
+        user_id__in=user_ids,
+        disbursement_date__in={application['disbursement_date'] for _, application in chunk},
+    ).values_list('user_id', 'disbursement_date', 'loan_amount'))
+
+    loans = []
+    events = []
+    for row, application in chunk:
+        user = users.get(application['unique_user_id'])
+        if user is None:
+            errors[row] = "User not found"
+            continue
+        loan_key = (user.pk, application['disbursement_date'], application['loan_amount'])
+        if loan_key in existing:
+            errors[row] = "Loan already exists"
+            continue
+        error = check_eligibility(user, application)
+        if error:
+            errors[row] = error
+            continue
+
+        principal_balance = application['principal_balance']
+        loan = Loan(
+            user=user,
+            loan_type=application['loan_type'],
+            loan_amount=application['loan_amount'],
+            interest_rate=application['interest_rate'],
+            term_period=application['term_period'],
+            disbursement_date=application['disbursement_date'],
+            principal_balance=principal_balance,
+            status='ACTIVE' if principal_balance > 0 else 'CLOSED',
+            next_billing_date=next_billing_date_for(application['disbursement_date'], as_of),
+        )
+        loans.append(loan)
+        events.append(BalanceEvent(
+            loan=loan,
+            event_date=application['disbursement_date'],
+            event_type='DISBURSEMENT',
+            amount=principal_balance,
+            principal_balance=principal_balance
+        ))
+
+        existing.add(loan_key)
+
+        # Later loans of the same user are checked against this one
+        if loan.status == 'ACTIVE':
+            user.active_loan_count += 1
+            user.outstanding_principal += principal_balance
+
+    with transaction.atomic():
+        Loan.objects.bulk_create(loans)
+        BalanceEvent.objects.bulk_create(events)
+    return len(loans)
+
+
+def import_loans(records, as_of=None, batch_size=None):
+    """
+    Import an iterable of (row, record) pairs.
+
+    Returns (created, errors) where errors maps row numbers to the reason
+    the record was rejected. Each chunk is committed on its own, so a
+    failed import can be rerun: the rows already imported are rejected as
+    existing loans.
+    """
+    as_of = as_of or timezone.now().date()
+    batch_size = batch_size or settings.LOAN_IMPORT_BATCH_SIZE
+    created = 0
+    errors = {}
+
+    chunk = []
+    for row, record in records:
+        try:
+            chunk.append((row, parse_loan_record(record)))
+        except LoanImportError as e:
+            errors[row] = str(e)
+            continue
+        if len(chunk) >= batch_size:
+            created += _import_chunk(chunk, as_of, errors)
+            chunk = []
+    if chunk:
+        created += _import_chunk(chunk, as_of, errors)
+
+    return created, errors
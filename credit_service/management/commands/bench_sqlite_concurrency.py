@@ -0,0 +1,153 @@
+import datetime
+import multiprocessing
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction, DatabaseError
+from django.db.models import Max
+from django.utils import timezone
+
+from credit_service.accrual import accrue_interest
+from credit_service.models import Loan, InterestAccrual
+from credit_service.sqlite_tuning import sqlite_status
+
+
+def _read_loan(loan_id):
+    """A statement style read that touches the table the accrual run writes to"""
+    loan = Loan.objects.get(loan_id=loan_id)
+    return loan, list(InterestAccrual.objects.filter(loan_id=loan_id).order_by('-accrual_date')[:30])
+
+
+def _write_loan(loan_id):
+    """A make-payment style write: lock the loan, then update it"""
+    with transaction.atomic():
+        Loan.objects.select_for_update().get(loan_id=loan_id)
+        Loan.objects.filter(loan_id=loan_id).update(updated_at=timezone.now())
+
+
+OPERATIONS = {'read': _read_loan, 'write': _write_loan}
+
+
+def _client(kind, loan_ids, interval, stop, results):
+    """
+    Client process: run one kind of operation every interval seconds until
+    stop is set, then report (kind, latencies, errors)
+    """
+    operation = OPERATIONS[kind]
+    latencies = []
+    errors = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            operation(random.choice(loan_ids))
+            latencies.append((time.perf_counter() - started) * 1000)
+        except DatabaseError as e:
+            errors.append(str(e))
+        if interval:
+            stop.wait(interval)
+    connections.close_all()
+    results.put((kind, latencies, errors))
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Measure read latency on SQLite before and during a daily interest accrual run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Concurrent reader processes')
+        parser.add_argument('--writers', type=int, default=1,
+                            help='Concurrent processes making small API style writes during the run')
+        parser.add_argument('--write-interval', type=float, default=0.05, help='Seconds between the writes of each writer')
+        parser.add_argument('--baseline-seconds', type=float, default=3, help='How long to measure reads without writes')
+        parser.add_argument('--accrual-date', type=datetime.date.fromisoformat,
+                            help='Date to accrue (YYYY-MM-DD); defaults to the day after the latest accrual')
+        parser.add_argument('--keep', action='store_true', help='Keep the accrual rows written by the benchmark')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("This benchmark is for SQLite databases")
+
+        self.stdout.write(f"SQLite settings: {sqlite_status(connection)}")
+
+        loan_ids = list(Loan.objects.filter(status='ACTIVE').values_list('loan_id', flat=True)[:1000])
+        if not loan_ids:
+            raise CommandError("No active loans to accrue")
+
+        accrual_date = options['accrual_date']
+        if accrual_date is None:
+            latest = InterestAccrual.objects.aggregate(latest=Max('accrual_date'))['latest']
+            accrual_date = latest + datetime.timedelta(days=1) if latest else datetime.date.today()
+        if InterestAccrual.objects.filter(accrual_date=accrual_date).exists():
+            raise CommandError(f"Accruals for {accrual_date} already exist; pick another --accrual-date")
+
+        clients = [('read', 0)] * options['readers'] + [('write', options['write_interval'])] * options['writers']
+        baseline = self.measure(loan_ids, clients, lambda: time.sleep(options['baseline_seconds']))
+
+        accrual = {}
+
+        def run_accrual():
+            started = time.perf_counter()
+            accrual.update(accrue_interest(accrual_date))
+            accrual['seconds'] = time.perf_counter() - started
+
+        during = self.measure(loan_ids, clients, run_accrual)
+
+        self.stdout.write(
+            f"{'phase':10} {'client':6} {'ok':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for phase, results in (('baseline', baseline), ('accrual', during)):
+            for kind, (latencies, errors) in sorted(results.items()):
+                if latencies:
+                    summary = (f"{statistics.median(latencies):8.2f} {_percentile(latencies, 0.95):8.2f} "
+                               f"{_percentile(latencies, 0.99):8.2f} {max(latencies):8.2f}")
+                else:
+                    summary = f"{'-':>8} {'-':>8} {'-':>8} {'-':>8}"
+                self.stdout.write(f"{phase:10} {kind:6} {len(latencies):7} {len(errors):7} {summary}")
+                if errors:
+                    self.stdout.write(f"           first error: {errors[0]}")
+        self.stdout.write(
+            f"Accrual for {accrual_date}: {accrual.get('accruals_created', 0)} rows "
+            f"in {accrual.get('seconds', 0):.1f}s"
+        )
+
+        if not options['keep']:
+            InterestAccrual.objects.filter(accrual_date=accrual_date).delete()
+
+    def measure(self, loan_ids, clients, workload):
+        """
+        Run one client process per (kind, interval) in clients while workload runs in this process.
+
+        Returns a dict of client kind to (latencies, errors). Clients are
+        separate processes so that they compete with the workload for
+        database locks rather than for the GIL.
+        """
+        # Forked readers must open their own connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(target=_client, args=(kind, loan_ids, interval, stop, results))
+            for kind, interval in clients
+        ]
+        for process in processes:
+            process.start()
+        try:
+            workload()
+        finally:
+            stop.set()
+            measured = {}
+            for _ in processes:
+                kind, latencies, errors = results.get()
+                kind_latencies, kind_errors = measured.setdefault(kind, ([], []))
+                kind_latencies += latencies
+                kind_errors += errors
+            for process in processes:
+                process.join()
+        return measured
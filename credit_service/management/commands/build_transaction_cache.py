@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from credit_service.transaction_cache import build_cache, load_cache
+
+
+class Command(BaseCommand):
+    help = 'Build the columnar cache of the transactions file used for credit scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if the cache is up to date')
+
+    def handle(self, *args, **options):
+        if options['force']:
+            result = build_cache()
+            self.stdout.write(self.style.SUCCESS(
+                f"Built transaction cache: {result['rows']} rows, {result['aadhar_ids']} Aadhaar IDs"
+            ))
+        else:
+            arrays = load_cache()
+            self.stdout.write(self.style.SUCCESS(
+                f"Transaction cache is up to date: {len(arrays['amounts'])} rows, "
+                f"{len(arrays['aadhar_ids'])} Aadhaar IDs"
+            ))
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = 'Show the database connection pooling configuration and connection usage'
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        self.stdout.write(f"Engine: {database['ENGINE']}")
+        self.stdout.write(f"Pool mode: {settings.DB_POOL_MODE} (process role: {settings.PROCESS_ROLE})")
+        self.stdout.write(f"CONN_MAX_AGE: {database.get('CONN_MAX_AGE')}")
+
+        if connection.vendor != 'postgresql':
+            self.stdout.write("Pooling settings only apply to PostgreSQL")
+            return
+
+        pool_options = database.get('OPTIONS', {}).get('pool')
+        if pool_options:
+            self.stdout.write(f"Pool options: {pool_options}")
+            connection.ensure_connection()
+            pool = connection.pool
+            if pool is not None:
+                for name, value in sorted(pool.get_stats().items()):
+                    self.stdout.write(f"  {name}: {value}")
+
+        # Server side view of every process sharing the database
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT application_name, state, count(*) FROM pg_stat_activity "
+                "WHERE datname = current_database() GROUP BY 1, 2 ORDER BY 1, 2"
+            )
+            rows = cursor.fetchall()
+            cursor.execute("SHOW max_connections")
+            max_connections = cursor.fetchone()[0]
+
+        self.stdout.write(f"Server connections (max_connections = {max_connections}):")
+        for application_name, state, count in rows:
+            self.stdout.write(f"  {application_name or '-':30} {state or '-':20} {count}")
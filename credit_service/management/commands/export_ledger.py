@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_service import exports
+
+
+class Command(BaseCommand):
+    help = 'Stream a ledger table (loans, billings, payments, interest-accruals) as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=list(exports.EXPORTS))
+        parser.add_argument('--format', choices=exports.FORMATS, default='ndjson')
+        parser.add_argument('--after-date', help='Resume after this date (YYYY-MM-DD)')
+        parser.add_argument('--after-id', help='Resume after this ID within --after-date')
+        parser.add_argument('--limit', type=int, help='Maximum number of rows to export')
+        parser.add_argument('--chunk-size', type=int, help='Rows per cursor fetch; defaults to EXPORT_CHUNK_SIZE')
+        parser.add_argument('--output', help='Write to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            export, after_date, after_id = exports.parse_cursor(
+                options['table'], options['after_date'], options['after_id']
+            )
+            rows = exports.export_rows(export, after_date, after_id, options['limit'], options['chunk_size'])
+        except exports.ExportError as e:
+            raise CommandError(str(e))
+
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        try:
+            for chunk in exports.render(export, rows, options['format']):
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,41 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_service.loan_import import iter_loan_records, import_loans
+
+
+class Command(BaseCommand):
+    help = 'Import loans from a CSV or NDJSON file, applying the loan eligibility rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file of loans')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='File format; defaults to the file extension')
+        parser.add_argument('--as-of', type=datetime.date.fromisoformat,
+                            help='Date the next billing dates are scheduled from (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--batch-size', type=int, help='Records per chunk; defaults to LOAN_IMPORT_BATCH_SIZE')
+        parser.add_argument('--errors', help='Write rejected rows to this file as NDJSON')
+        parser.add_argument('--show', type=int, default=10, help='Number of rejected rows to print')
+
+    def handle(self, *args, **options):
+        try:
+            records = iter_loan_records(options['path'], options['format'])
+            started = time.perf_counter()
+            created, errors = import_loans(records, as_of=options['as_of'], batch_size=options['batch_size'])
+            elapsed = time.perf_counter() - started
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for row in sorted(errors)[:options['show']]:
+            self.stdout.write(f"Row {row}: {errors[row]}")
+        if options['errors']:
+            with open(options['errors'], 'w') as f:
+                for row in sorted(errors):
+                    f.write(json.dumps({"row": row, "error": errors[row]}) + "\n")
+
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} loans, rejected {len(errors)} rows in {elapsed:.1f}s ({rate:.0f} loans/s)"
+        ))
@@ -0,0 +1,126 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from credit_service.models import Loan
+
+
+async def _read_response(reader):
+    """Read one HTTP/1.1 response, returning (status code, keep the connection open)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(url, remaining, latencies, failures):
+    """Send requests over one keep-alive connection until the shared budget is used up"""
+    parts = urlsplit(url)
+    host = parts.hostname
+    port = parts.port or 80
+    target = parts.path + (f'?{parts.query}' if parts.query else '')
+    request = f"GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\nConnection: keep-alive\r\n\r\n".encode()
+
+    reader = writer = None
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+            if status != 200:
+                failures[status] = failures.get(status, 0) + 1
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+            keep_alive = False
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, requests, concurrency):
+    """Return (latencies in ms of successful requests, failure counts, elapsed seconds)"""
+    remaining = [requests]
+    latencies = []
+    failures = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(url, remaining, latencies, failures) for _ in range(concurrency)))
+    return latencies, failures, time.perf_counter() - started
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Load test get-statement against running servers, e.g. the WSGI and ASGI deployments side by side'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='+', metavar='NAME=URL',
+            help='Servers to compare, e.g. wsgi=http://127.0.0.1:8000/api/get-statement/ '
+                 'asgi=http://127.0.0.1:8001/api/async/get-statement/'
+        )
+        parser.add_argument('--loan-id', help='Loan to request; defaults to the first loan in the database')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per target')
+        parser.add_argument('--concurrency', type=int, default=100, help='Concurrent connections per target')
+
+    def handle(self, *args, **options):
+        loan_id = options['loan_id'] or Loan.objects.values_list('loan_id', flat=True).first()
+        if loan_id is None:
+            raise CommandError("No loans to request; pass --loan-id")
+
+        targets = []
+        for target in options['targets']:
+            name, separator, url = target.partition('=')
+            if not separator or not url.startswith('http://'):
+                raise CommandError(f"Expected NAME=http://host:port/path, got '{target}'")
+            if 'loan_id=' not in url:
+                url += ('&' if '?' in url else '?') + f'loan_id={loan_id}'
+            targets.append((name, url))
+
+        self.stdout.write(f"{'target':10} {'ok':>7} {'failed':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for name, url in targets:
+            latencies, failures, elapsed = asyncio.run(run_load(url, options['requests'], options['concurrency']))
+            failed = sum(failures.values())
+            if latencies:
+                summary = (f"{len(latencies) / elapsed:8.0f} {statistics.median(latencies):8.1f} "
+                           f"{_percentile(latencies, 0.95):8.1f} {_percentile(latencies, 0.99):8.1f}")
+            else:
+                summary = f"{'-':>8} {'-':>8} {'-':>8} {'-':>8}"
+            self.stdout.write(f"{name:10} {len(latencies):7} {failed:7} {summary}")
+            if failures:
+                self.stdout.write(f"           failures: {failures}")
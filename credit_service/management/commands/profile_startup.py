@@ -0,0 +1,65 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_imports(target, lazy):
+    """
+    Import target in a fresh interpreter with -X importtime.
+
+    Returns a list of (module, self microseconds, cumulative microseconds, depth).
+    """
+    env = dict(os.environ, LAZY_IMPORTS='True' if lazy else 'False')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {target}'],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise CommandError(f"Importing {target} failed:\n{result.stderr[-2000:]}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = 'Report the per-module import cost of a cold start of the serverless entry point'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', default='vercel_app', help='Module imported on a cold start')
+        parser.add_argument('--lazy', action='store_true', help='Profile with LAZY_IMPORTS=True')
+        parser.add_argument('--top', type=int, default=15, help='Number of packages and modules to list')
+        parser.add_argument('--budget-ms', type=float,
+                            help='Fail if the total import time exceeds this many milliseconds')
+
+    def handle(self, *args, **options):
+        modules = profile_imports(options['target'], options['lazy'])
+        total_ms = sum(self_us for _, self_us, _, _ in modules) / 1000
+
+        packages = defaultdict(int)
+        for module, self_us, _, _ in modules:
+            packages[module.split('.')[0]] += self_us
+
+        self.stdout.write(f"Packages by import time (of {total_ms:.1f} ms):")
+        for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"  {self_us / 1000:8.1f} ms  {package}")
+
+        self.stdout.write("Modules by cumulative import time:")
+        for module, _, cumulative_us, _ in sorted(modules, key=lambda item: -item[2])[:options['top']]:
+            self.stdout.write(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+        budget = options['budget_ms']
+        if budget is not None and total_ms > budget:
+            raise CommandError(f"Cold start imports took {total_ms:.1f} ms, over the budget of {budget:.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"Cold start imports: {total_ms:.1f} ms"))
@@ -0,0 +1,114 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from credit_service.interest import interest_between, loan_events
+from credit_service.models import Loan, Payment, InterestAccrual, BalanceEvent
+
+BATCH_SIZE = 500
+
+
+def _contiguous_runs(dates):
+    """Split sorted dates into (first, last) runs of consecutive days"""
+    runs = []
+    for day in dates:
+        if runs and day == runs[-1][1] + datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+class Command(BaseCommand):
+    help = 'Backfill balance events and compare the event based interest engine with the daily accrual rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Create balance events for loans that have none, from the loan and its payments')
+        parser.add_argument('--show', type=int, default=10, help='Number of mismatching loans to print')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            created = self.backfill()
+            self.stdout.write(f"Backfilled {created} balance events")
+
+        checked, mismatches = self.verify()
+        for loan_id, rows_total, engine_total in mismatches[:options['show']]:
+            self.stdout.write(f"Loan {loan_id}: accrual rows {rows_total}, events engine {engine_total}")
+
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} of {checked} loans differ between the interest engines")
+        self.stdout.write(self.style.SUCCESS(f"Interest engines agree on all {checked} loans with accrual rows"))
+
+    def _loan_batches(self, loans):
+        last_id = None
+        loans = loans.order_by('loan_id')
+        while True:
+            batch = list((loans if last_id is None else loans.filter(loan_id__gt=last_id))[:BATCH_SIZE])
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].loan_id
+
+    def backfill(self):
+        created = 0
+        loans = Loan.objects.filter(balance_events__isnull=True).only('loan_id', 'loan_amount', 'disbursement_date')
+        for batch in self._loan_batches(loans):
+            payments = defaultdict(list)
+            for payment in Payment.objects.filter(loan__in=batch).order_by('payment_date', 'created_at'):
+                payments[payment.loan_id].append(payment)
+
+            events = []
+            for loan in batch:
+                balance = loan.loan_amount
+                events.append(BalanceEvent(
+                    loan=loan,
+                    event_date=loan.disbursement_date,
+                    event_type='DISBURSEMENT',
+                    amount=balance,
+                    principal_balance=balance
+                ))
+                for payment in payments[loan.loan_id]:
+                    balance -= payment.principal_payment
+                    events.append(BalanceEvent(
+                        loan=loan,
+                        event_date=payment.payment_date,
+                        event_type='PAYMENT',
+                        amount=-payment.principal_payment,
+                        principal_balance=balance
+                    ))
+
+            with transaction.atomic():
+                BalanceEvent.objects.bulk_create(events)
+            created += len(events)
+        return created
+
+    def verify(self):
+        checked = 0
+        mismatches = []
+        loans = Loan.objects.filter(interest_accruals__isnull=False).distinct().only('loan_id', 'interest_rate')
+        for batch in self._loan_batches(loans):
+            accruals = defaultdict(list)
+            rows = InterestAccrual.objects.filter(loan__in=batch).order_by('accrual_date')
+            for loan_id, accrual_date, interest_amount in rows.values_list('loan_id', 'accrual_date', 'interest_amount'):
+                accruals[loan_id].append((accrual_date, interest_amount))
+
+            last_date = max(accrual_date for rows in accruals.values() for accrual_date, _ in rows)
+            events = loan_events([loan.loan_id for loan in batch], last_date)
+
+            for loan in batch:
+                loan_accruals = accruals[loan.loan_id]
+                rows_total = sum((amount for _, amount in loan_accruals), Decimal('0'))
+                engine_total = sum(
+                    (interest_between(events.get(loan.loan_id, []), loan.interest_rate, first, last)
+                     for first, last in _contiguous_runs([day for day, _ in loan_accruals])),
+                    Decimal('0')
+                )
+                checked += 1
+                if rows_total != engine_total:
+                    mismatches.append((loan.loan_id, rows_total, engine_total))
+
+        return checked, mismatches
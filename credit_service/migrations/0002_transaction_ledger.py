@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionAggregate',
+            fields=[
+                ('aadhar_id', models.CharField(max_length=12, primary_key=True, serialize=False)),
+                ('total_credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('total_debit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('transaction_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TransactionSource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('mtime', models.FloatField(default=0)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('checkpoint_digest', models.CharField(blank=True, max_length=40)),
+                ('rows_ingested', models.BigIntegerField(default=0)),
+                ('ingested_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
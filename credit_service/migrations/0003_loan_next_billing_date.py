@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:06
+
+import datetime
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_next_billing_date(apps, schema_editor):
+    Loan = apps.get_model('credit_service', 'Loan')
+    loans = Loan.objects.annotate(last_billing_date=Max('billings__billing_date'))
+    
+    batch = []
+    for loan in loans.iterator(chunk_size=1000):
+        last_date = loan.last_billing_date or loan.disbursement_date
+        loan.next_billing_date = last_date + datetime.timedelta(days=30)
+        batch.append(loan)
+        if len(batch) >= 1000:
+            Loan.objects.bulk_update(batch, ['next_billing_date'])
+            batch = []
+    Loan.objects.bulk_update(batch, ['next_billing_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0002_transaction_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='next_billing_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_next_billing_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0003_loan_next_billing_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billing',
+            index=models.Index(fields=['loan', 'billing_date'], name='billing_loan_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interestaccrual',
+            index=models.Index(condition=models.Q(('billing__isnull', True)), fields=['loan', 'accrual_date'], name='accrual_unbilled_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['next_billing_date'], name='loan_active_billing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(condition=models.Q(('status', 'ACTIVE')), fields=['loan_id'], name='loan_active_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['loan', 'payment_date'], name='payment_loan_date_idx'),
+        ),
+    ]
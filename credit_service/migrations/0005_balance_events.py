@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_date', models.DateField()),
+                ('event_type', models.CharField(choices=[('DISBURSEMENT', 'Disbursement'), ('PAYMENT', 'Payment')], max_length=12)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('principal_balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_events', to='credit_service.loan')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['loan', 'event_date'], name='balance_event_loan_date_idx')],
+            },
+        ),
+    ]
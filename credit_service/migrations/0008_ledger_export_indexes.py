@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0007_loan_statements'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='billing',
+            index=models.Index(fields=['billing_date', 'billing_id'], name='billing_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='interestaccrual',
+            index=models.Index(fields=['accrual_date', 'id'], name='accrual_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loan',
+            index=models.Index(fields=['disbursement_date', 'loan_id'], name='loan_export_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_date', 'payment_id'], name='payment_export_idx'),
+        ),
+    ]
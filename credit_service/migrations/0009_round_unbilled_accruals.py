@@ -0,0 +1,41 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import migrations
+
+
+def round_unbilled_accruals(apps, schema_editor):
+    """
+    Round unbilled accrual amounts half up to paise, as new accruals are.
+
+    Older accruals stored the unrounded amount. PostgreSQL rounded it half up
+    on insert, so nothing changes there; SQLite kept every digit, and summing
+    those into the next bill would disagree with the rounded daily amounts.
+    Billed accruals are left alone so they keep matching their bills.
+    """
+    InterestAccrual = apps.get_model('credit_service', 'InterestAccrual')
+    accruals = InterestAccrual.objects.filter(billing__isnull=True).only(
+        'principal_balance', 'daily_interest_rate', 'interest_amount'
+    )
+
+    batch = []
+    for accrual in accruals.iterator(chunk_size=1000):
+        amount = (accrual.principal_balance * accrual.daily_interest_rate / Decimal('100')).quantize(
+            Decimal('0.01'), rounding=ROUND_HALF_UP
+        )
+        accrual.interest_amount = amount
+        batch.append(accrual)
+        if len(batch) >= 1000:
+            InterestAccrual.objects.bulk_update(batch, ['interest_amount'])
+            batch = []
+    InterestAccrual.objects.bulk_update(batch, ['interest_amount'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('credit_service', '0008_ledger_export_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(round_unbilled_accruals, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,31 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
-from decimal import Decimal
+from decimal import Decimal, ROUND_HALF_UP
 from django.utils import timezone
 import datetime
 
 
+def daily_interest_rate_for(interest_rate):
+    """Daily interest rate (in percent) for an annual interest rate in percent"""
+    return round(interest_rate / Decimal('365'), 3)
+
+
+def daily_interest_for(principal_balance, daily_rate):
+    """
+    One day's interest on a principal balance, rounded half up to paise.
+
+    This is the rounding PostgreSQL's numeric(10, 2) column applied when the
+    unrounded amount was stored; SQLite kept the unrounded amount.
+    """
+    return (principal_balance * daily_rate / Decimal('100')).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def minimum_due_for(principal_balance, interest_accrued):
+    """Minimum due for a billing cycle: 3% of the principal balance plus the cycle's interest"""
+    return principal_balance * Decimal('0.03') + interest_accrued
+
+
 class User(models.Model):
     """
     Model representing a user registered in the system.
@@ -44,23 +65,63 @@ class Loan(models.Model):
     disbursement_date = models.DateField()
     principal_balance = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=10, choices=LOAN_STATUS_CHOICES, default='ACTIVE')
+    next_billing_date = models.DateField(null=True, blank=True)  # Denormalized from billings for the daily billing run
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Daily billing: status = 'ACTIVE' AND next_billing_date = today
+            models.Index(
+                fields=['next_billing_date'],
+                name='loan_active_billing_idx',
+                condition=models.Q(status='ACTIVE'),
+            ),
+            # Accrual and sharding: keyset walk over active loans ordered by loan_id
+            models.Index(
+                fields=['loan_id'],
+                name='loan_active_id_idx',
+                condition=models.Q(status='ACTIVE'),
+            ),
+            # Ledger exports: keyset pagination by (disbursement_date, loan_id)
+            models.Index(fields=['disbursement_date', 'loan_id'], name='loan_export_idx'),
+        ]
+    
     def __str__(self):
         return f"Loan {self.loan_id} - {self.user.name}"
     
+    def save(self, *args, **kwargs):
+        # The first billing date is 30 days after disbursement
+        if self.next_billing_date is None and self.disbursement_date:
+            self.next_billing_date = self.disbursement_date + datetime.timedelta(days=30)
+        
+        adding = self._state.adding
+        # A new loan is never saved without its disbursement event
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            if adding:
+                BalanceEvent.objects.create(
+                    loan=self,
+                    event_date=self.disbursement_date,
+                    event_type='DISBURSEMENT',
+                    amount=self.principal_balance,
+                    principal_balance=self.principal_balance
+                )
+    
     def daily_interest_rate(self):
         """Calculate daily interest rate"""
-        return round(self.interest_rate / Decimal('365'), 3)
+        return daily_interest_rate_for(self.interest_rate)
     
     def calculate_min_due(self, interest_accrued):
         """Calculate minimum due amount for a billing cycle"""
-        principal_portion = self.principal_balance * Decimal('0.03')  # 3% of principal balance
-        return principal_portion + interest_accrued
+        return minimum_due_for(self.principal_balance, interest_accrued)
     
     def get_next_billing_date(self):
         """Get the next billing date, which is 30 days after account creation or last billing date"""
+        if self.next_billing_date:
+            return self.next_billing_date
+        
         last_billing = self.billings.order_by('-billing_date').first()
         
         if last_billing:
@@ -90,6 +151,14 @@ class Billing(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Latest billing per loan and statement listings
+            models.Index(fields=['loan', 'billing_date'], name='billing_loan_date_idx'),
+            # Ledger exports: keyset pagination by (billing_date, billing_id)
+            models.Index(fields=['billing_date', 'billing_id'], name='billing_export_idx'),
+        ]
+    
     def __str__(self):
         return f"Billing {self.billing_id} for Loan {self.loan.loan_id}"
 
@@ -108,6 +177,14 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # Statement listings of a loan's payments by date
+            models.Index(fields=['loan', 'payment_date'], name='payment_loan_date_idx'),
+            # Ledger exports: keyset pagination by (payment_date, payment_id)
+            models.Index(fields=['payment_date', 'payment_id'], name='payment_export_idx'),
+        ]
+    
     def __str__(self):
         return f"Payment {self.payment_id} for Loan {self.loan.loan_id}"
 
@@ -126,6 +203,114 @@ class InterestAccrual(models.Model):
     
     class Meta:
         unique_together = ('loan', 'accrual_date')
+        indexes = [
+            # Billing window scans over accruals not yet linked to a bill
+            models.Index(
+                fields=['loan', 'accrual_date'],
+                name='accrual_unbilled_idx',
+                condition=models.Q(billing__isnull=True),
+            ),
+            # Ledger exports: keyset pagination by (accrual_date, id)
+            models.Index(fields=['accrual_date', 'id'], name='accrual_export_idx'),
+        ]
     
     def __str__(self):
         return f"Interest accrual for Loan {self.loan.loan_id} on {self.accrual_date}"
+
+
+class TransactionAggregate(models.Model):
+    """
+    Per-Aadhaar credit and debit totals folded from the transactions file.
+    """
+    aadhar_id = models.CharField(max_length=12, primary_key=True)
+    total_credit = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    total_debit = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+    transaction_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def net_balance(self):
+        """Account balance used for credit scoring (CREDIT - DEBIT)"""
+        return self.total_credit - self.total_debit
+    
+    def __str__(self):
+        return f"Transaction aggregate for {self.aadhar_id}"
+
+
+class TransactionSource(models.Model):
+    """
+    Ingestion checkpoint for the transactions file backing TransactionAggregate.
+    """
+    path = models.CharField(max_length=500, unique=True)
+    size = models.BigIntegerField(default=0)
+    mtime = models.FloatField(default=0)
+    offset = models.BigIntegerField(default=0)  # Bytes of the file already folded into the aggregates
+    checkpoint_digest = models.CharField(max_length=40, blank=True)
+    rows_ingested = models.BigIntegerField(default=0)
+    ingested_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Transaction source {self.path}"
+
+
+class BalanceEvent(models.Model):
+    """
+    Change to a loan's principal balance, used by the event based interest engine.
+    """
+    EVENT_TYPE_CHOICES = [
+        ('DISBURSEMENT', 'Disbursement'),
+        ('PAYMENT', 'Payment'),
+    ]
+    
+    loan = models.ForeignKey(Loan, on_delete=models.CASCADE, related_name='balance_events')
+    event_date = models.DateField()
+    event_type = models.CharField(max_length=12, choices=EVENT_TYPE_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)  # Signed change to the principal balance
+    principal_balance = models.DecimalField(max_digits=10, decimal_places=2)  # Balance after the event
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['loan', 'event_date'], name='balance_event_loan_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} on {self.event_date} for Loan {self.loan_id}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Stored response of a POST made with an Idempotency-Key header.
+    
+    A row with a NULL response_status is a reservation for a request that
+    is still being processed.
+    """
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ('endpoint', 'key')
+    
+    def __str__(self):
+        return f"Idempotency key {self.key} for {self.endpoint}"
+
+
+class LoanStatement(models.Model):
+    """
+    Pre-serialized statement of a loan.
+    
+    version is bumped whenever a payment or billing changes the statement;
+    payload is only served while payload_version matches it.
+    """
+    loan = models.OneToOneField(Loan, on_delete=models.CASCADE, primary_key=True, related_name='statement')
+    version = models.PositiveIntegerField(default=0)
+    payload_version = models.PositiveIntegerField(null=True, blank=True)
+    payload = models.TextField(blank=True)  # Rendered StatementResponseSerializer JSON
+    built_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Statement v{self.version} for Loan {self.loan_id}"
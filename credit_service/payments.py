@@ -0,0 +1,118 @@
+"""
+Payment allocation.
+
+A payment is applied in one transaction with one locked read of the loan:
+unpaid bills are loaded oldest-first together with what has already been
+paid against them, the amount is allocated to past dues first (interest
+before principal within each bill) and anything left over is a principal
+prepayment. The number of queries does not depend on how many bills are
+outstanding, and the row lock on the loan serializes concurrent payments.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import DecimalField, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .accrual import restate_accruals
+from .interest import record_payment_event
+from .models import Loan, Billing, Payment
+from .statements import invalidate_statements
+
+
+class PaymentError(Exception):
+    """Raised when a payment cannot be applied to a loan"""
+
+
+def _paid_total(field):
+    return Coalesce(
+        Sum(f'payments__{field}'),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+
+
+def make_payment(loan_id, amount, payment_date=None):
+    """
+    Apply a payment to a loan and return the created Payment rows.
+
+    Raises PaymentError if the loan does not exist, is closed, or the amount
+    is more than the outstanding principal and billed interest.
+    """
+    payment_date = payment_date or timezone.now().date()
+    
+    with transaction.atomic():
+        try:
+            loan = Loan.objects.select_for_update().get(loan_id=loan_id)
+        except Loan.DoesNotExist:
+            raise PaymentError("Loan not found")
+        
+        if loan.status != 'ACTIVE':
+            raise PaymentError("Loan is already closed")
+        
+        unpaid_bills = list(
+            Billing.objects.filter(loan=loan, is_paid=False)
+            .annotate(paid=_paid_total('amount'), interest_paid=_paid_total('interest_payment'))
+            .order_by('billing_date')
+        )
+        
+        outstanding_interest = sum(
+            (max(bill.interest_amount - bill.interest_paid, Decimal('0')) for bill in unpaid_bills),
+            Decimal('0')
+        )
+        if amount > loan.principal_balance + outstanding_interest:
+            raise PaymentError("Payment exceeds the outstanding balance")
+        
+        remaining = amount
+        payments = []
+        paid_bill_ids = []
+        
+        # Past dues first, oldest bill first
+        for bill in unpaid_bills:
+            if remaining <= 0:
+                break
+            
+            bill_due = max(bill.minimum_due - bill.paid, Decimal('0'))
+            allocated = min(remaining, bill_due)
+            interest_payment = min(allocated, max(bill.interest_amount - bill.interest_paid, Decimal('0')))
+            
+            if allocated > 0:
+                payments.append(Payment(
+                    loan=loan,
+                    billing=bill,
+                    payment_date=payment_date,
+                    amount=allocated,
+                    principal_payment=allocated - interest_payment,
+                    interest_payment=interest_payment
+                ))
+                remaining -= allocated
+            
+            if allocated == bill_due:
+                paid_bill_ids.append(bill.billing_id)
+        
+        # Whatever is left reduces the principal directly
+        if remaining > 0:
+            payments.append(Payment(
+                loan=loan,
+                payment_date=payment_date,
+                amount=remaining,
+                principal_payment=remaining,
+                interest_payment=Decimal('0')
+            ))
+        
+        Payment.objects.bulk_create(payments)
+        if paid_bill_ids:
+            Billing.objects.filter(billing_id__in=paid_bill_ids).update(is_paid=True, updated_at=timezone.now())
+        
+        principal_paid = sum((payment.principal_payment for payment in payments), Decimal('0'))
+        if principal_paid:
+            loan.principal_balance = max(loan.principal_balance - principal_paid, Decimal('0'))
+            if loan.principal_balance == 0:
+                loan.status = 'CLOSED'
+            loan.save(update_fields=['principal_balance', 'status', 'updated_at'])
+            record_payment_event(loan, payment_date, principal_paid)
+            restate_accruals(loan, payment_date)
+        
+        invalidate_statements([loan.loan_id])
+        return payments
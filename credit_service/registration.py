@@ -0,0 +1,103 @@
+"""
+Bulk user registration.
+
+Validated rows are inserted in chunks of REGISTRATION_BATCH_SIZE. For each
+chunk, the Aadhaar numbers and emails that are already registered are found
+with one IN query. The chunk is then inserted with one bulk_create. A row
+that collides with an existing user or an earlier row of the same upload is
+reported against its row number, and the rest of the upload is still
+registered.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import User
+
+DUPLICATE_AADHAR = "user with this aadhar id already exists."
+DUPLICATE_EMAIL = "user with this email already exists."
+
+
+def _existing(chunk):
+    """Return the Aadhaar numbers and emails of the chunk that are already registered"""
+    aadhar_ids = {data['aadhar_id'] for _, data in chunk}
+    emails = {data['email'] for _, data in chunk}
+    rows = User.objects.filter(Q(aadhar_id__in=aadhar_ids) | Q(email__in=emails)).values_list('aadhar_id', 'email')
+    existing_aadhar_ids = set()
+    existing_emails = set()
+    for aadhar_id, email in rows:
+        existing_aadhar_ids.add(aadhar_id)
+        existing_emails.add(email)
+    return existing_aadhar_ids, existing_emails
+
+
+def _insert(users):
+    """
+    Insert a chunk of users, returning (created, errors).
+
+    If a concurrent registration took one of the Aadhaar numbers or emails
+    after the pre-check, the chunk is retried row by row so only the
+    conflicting rows fail.
+    """
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user in users])
+        return users, {}
+    except IntegrityError:
+        pass
+
+    created = []
+    errors = {}
+    for row, user in users:
+        try:
+            with transaction.atomic():
+                user.save(force_insert=True)
+            created.append((row, user))
+        except IntegrityError:
+            errors[row] = {"non_field_errors": ["user with this aadhar id or email already exists."]}
+    return created, errors
+
+
+def register_users(rows, batch_size=None):
+    """
+    Register an iterable of (row_number, validated_data) pairs.
+
+    Returns (created, errors): created is a list of (row_number, user) and
+    errors maps row numbers to field errors in the serializer error format.
+    """
+    batch_size = batch_size or settings.REGISTRATION_BATCH_SIZE
+    seen_aadhar_ids = set()
+    seen_emails = set()
+    created = []
+    errors = {}
+
+    def flush(chunk):
+        existing_aadhar_ids, existing_emails = _existing(chunk)
+        users = []
+        for row, data in chunk:
+            row_errors = {}
+            if data['aadhar_id'] in existing_aadhar_ids or data['aadhar_id'] in seen_aadhar_ids:
+                row_errors['aadhar_id'] = [DUPLICATE_AADHAR]
+            if data['email'] in existing_emails or data['email'] in seen_emails:
+                row_errors['email'] = [DUPLICATE_EMAIL]
+            if row_errors:
+                errors[row] = row_errors
+                continue
+            seen_aadhar_ids.add(data['aadhar_id'])
+            seen_emails.add(data['email'])
+            users.append((row, User(**data)))
+
+        chunk_created, chunk_errors = _insert(users)
+        created.extend(chunk_created)
+        errors.update(chunk_errors)
+
+    chunk = []
+    for row, data in rows:
+        chunk.append((row, data))
+        if len(chunk) >= batch_size:
+            flush(chunk)
+            chunk = []
+    if chunk:
+        flush(chunk)
+
+    return created, errors
@@ -3,6 +3,7 @@ This module contains serializers for the credit service.
 If REST Framework is not available, it provides dummy versions.
 """
 from .models import User, Loan, Billing, Payment
+from .eligibility import load_applicant, check_eligibility
 from decimal import Decimal
 from django.conf import settings
 
@@ -10,6 +11,9 @@ from django.conf import settings
 class UserSerializer:
     pass
 
+class BulkUserSerializer:
+    pass
+
 class LoanApplicationSerializer:
     pass
 
@@ -37,6 +41,19 @@ try:
             model = User
             fields = ['unique_user_id', 'aadhar_id', 'name', 'email', 'annual_income', 'credit_score']
             read_only_fields = ['unique_user_id', 'credit_score']
+
+    class BulkUserSerializer(UserSerializer):
+        """
+        UserSerializer without the per-row uniqueness queries.
+        
+        Bulk registration checks aadhar_id and email for a whole chunk of rows
+        with one query instead.
+        """
+        class Meta(UserSerializer.Meta):
+            extra_kwargs = {
+                'aadhar_id': {'validators': []},
+                'email': {'validators': []},
+            }
             
     class LoanApplicationSerializer(serializers.ModelSerializer):
         unique_user_id = serializers.UUIDField()
@@ -56,58 +73,20 @@ try:
             - Loan amount <= 5,000
             - Interest rate >= 12%
             - Monthly EMI <= 20% of monthly income
+            - Optional limits on active loans and outstanding principal
+            
+            The user and their current exposure are loaded with one query and
+            handed to the create step as data['user'].
             """
-            # Validate user exists
-            try:
-                user = User.objects.get(unique_user_id=data['unique_user_id'])
-            except User.DoesNotExist:
+            user = load_applicant(data['unique_user_id'])
+            if user is None:
                 raise serializers.ValidationError("User not found")
             
-            # Validate credit score
-            if not user.credit_score or user.credit_score < settings.MIN_CREDIT_SCORE_FOR_LOAN:
-                raise serializers.ValidationError("Credit score is too low or not available")
-            
-            # Validate annual income
-            if user.annual_income < settings.MIN_ANNUAL_INCOME:
-                raise serializers.ValidationError("Annual income does not meet minimum requirements")
-            
-            # Validate loan amount
-            if data['loan_amount'] > settings.MAX_LOAN_AMOUNT:
-                raise serializers.ValidationError(f"Loan amount exceeds maximum allowed amount of {settings.MAX_LOAN_AMOUNT}")
-            
-            # Validate interest rate
-            if data['interest_rate'] < settings.MIN_INTEREST_RATE:
-                raise serializers.ValidationError(f"Interest rate must be at least {settings.MIN_INTEREST_RATE}%")
-            
-            # Validate loan type
-            if data['loan_type'] != 'CC':
-                raise serializers.ValidationError("Only Credit Card loans are supported at this time")
-            
-            # Validate EMI doesn't exceed 20% of monthly income
-            monthly_income = user.annual_income / Decimal('12')
-            max_allowed_emi = monthly_income * settings.MAX_EMI_PERCENTAGE_OF_INCOME / Decimal('100')
-            
-            # Calculate EMI (approximate using simple interest for validation)
-            principal = data['loan_amount']
-            rate = data['interest_rate'] / Decimal('100') / Decimal('12')  # Monthly rate
-            term = data['term_period']
-            
-            # Principal portion (3% of principal)
-            principal_portion = principal * Decimal('0.03')
-            
-            # Interest for first month
-            monthly_interest = principal * rate
-            
-            # Estimated first EMI
-            estimated_emi = principal_portion + monthly_interest
-            
-            if estimated_emi > max_allowed_emi:
-                raise serializers.ValidationError(f"Monthly EMI exceeds {settings.MAX_EMI_PERCENTAGE_OF_INCOME}% of monthly income")
-            
-            # Ensure monthly interest exceeds minimum required
-            if monthly_interest < settings.MIN_MONTHLY_INTEREST:
-                raise serializers.ValidationError(f"Monthly interest must be at least {settings.MIN_MONTHLY_INTEREST}")
+            error = check_eligibility(user, data)
+            if error:
+                raise serializers.ValidationError(error)
             
+            data['user'] = user
             return data
 
     class PaymentSerializer(serializers.Serializer):
@@ -115,14 +94,9 @@ try:
         amount = serializers.DecimalField(max_digits=10, decimal_places=2)
         
         def validate(self, data):
-            # Validate loan exists and is active
-            try:
-                loan = Loan.objects.get(loan_id=data['loan_id'])
-            except Loan.DoesNotExist:
-                raise serializers.ValidationError("Loan not found")
-            
-            if loan.status != 'ACTIVE':
-                raise serializers.ValidationError("Loan is already closed")
+            # The loan itself is checked under a row lock when the payment is applied
+            if data['amount'] <= 0:
+                raise serializers.ValidationError("Payment amount must be positive")
             
             return data
 
@@ -163,6 +137,19 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['unique_user_id', 'aadhar_id', 'name', 'email', 'annual_income', 'credit_score']
         read_only_fields = ['unique_user_id', 'credit_score']
+
+class BulkUserSerializer(UserSerializer):
+    """
+    UserSerializer without the per-row uniqueness queries.
+    
+    Bulk registration checks aadhar_id and email for a whole chunk of rows
+    with one query instead.
+    """
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {
+            'aadhar_id': {'validators': []},
+            'email': {'validators': []},
+        }
         
 
 class LoanApplicationSerializer(serializers.ModelSerializer):
@@ -183,58 +170,20 @@ class LoanApplicationSerializer(serializers.ModelSerializer):
         - Loan amount <= 5,000
         - Interest rate >= 12%
         - Monthly EMI <= 20% of monthly income
+        - Optional limits on active loans and outstanding principal
+        
+        The user and their current exposure are loaded with one query and
+        handed to the create step as data['user'].
         """
-        # Validate user exists
-        try:
-            user = User.objects.get(unique_user_id=data['unique_user_id'])
-        except User.DoesNotExist:
+        user = load_applicant(data['unique_user_id'])
+        if user is None:
             raise serializers.ValidationError("User not found")
         
-        # Validate credit score
-        if not user.credit_score or user.credit_score < settings.MIN_CREDIT_SCORE_FOR_LOAN:
-            raise serializers.ValidationError("Credit score is too low or not available")
-        
-        # Validate annual income
-        if user.annual_income < settings.MIN_ANNUAL_INCOME:
-            raise serializers.ValidationError("Annual income does not meet minimum requirements")
-        
-        # Validate loan amount
-        if data['loan_amount'] > settings.MAX_LOAN_AMOUNT:
-            raise serializers.ValidationError(f"Loan amount exceeds maximum allowed amount of {settings.MAX_LOAN_AMOUNT}")
-        
-        # Validate interest rate
-        if data['interest_rate'] < settings.MIN_INTEREST_RATE:
-            raise serializers.ValidationError(f"Interest rate must be at least {settings.MIN_INTEREST_RATE}%")
-        
-        # Validate loan type
-        if data['loan_type'] != 'CC':
-            raise serializers.ValidationError("Only Credit Card loans are supported at this time")
-        
-        # Validate EMI doesn't exceed 20% of monthly income
-        monthly_income = user.annual_income / Decimal('12')
-        max_allowed_emi = monthly_income * settings.MAX_EMI_PERCENTAGE_OF_INCOME / Decimal('100')
-        
-        # Calculate EMI (approximate using simple interest for validation)
-        principal = data['loan_amount']
-        rate = data['interest_rate'] / Decimal('100') / Decimal('12')  # Monthly rate
-        term = data['term_period']
-        
-        # Principal portion (3% of principal)
-        principal_portion = principal * Decimal('0.03')
+        error = check_eligibility(user, data)
+        if error:
+            raise serializers.ValidationError(error)
         
-        # Interest for first month
-        monthly_interest = principal * rate
-        
-        # Estimated first EMI
-        estimated_emi = principal_portion + monthly_interest
-        
-        if estimated_emi > max_allowed_emi:
-            raise serializers.ValidationError(f"Monthly EMI exceeds {settings.MAX_EMI_PERCENTAGE_OF_INCOME}% of monthly income")
-        
-        # Ensure monthly interest exceeds minimum required
-        if monthly_interest < settings.MIN_MONTHLY_INTEREST:
-            raise serializers.ValidationError(f"Monthly interest must be at least {settings.MIN_MONTHLY_INTEREST}")
-            
+        data['user'] = user
         return data
 
 
@@ -243,14 +192,9 @@ class PaymentSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2)
     
     def validate(self, data):
-        # Validate loan exists and is active
-        try:
-            loan = Loan.objects.get(loan_id=data['loan_id'])
-        except Loan.DoesNotExist:
-            raise serializers.ValidationError("Loan not found")
-            
-        if loan.status != 'ACTIVE':
-            raise serializers.ValidationError("Loan is already closed")
+        # The loan itself is checked under a row lock when the payment is applied
+        if data['amount'] <= 0:
+            raise serializers.ValidationError("Payment amount must be positive")
             
         return data
 
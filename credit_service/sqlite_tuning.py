@@ -0,0 +1,63 @@
+"""
+SQLite connection tuning.
+
+apply_sqlite_pragmas is connected to connection_created and sets
+settings.SQLITE_PRAGMAS on every new SQLite connection. A pragma that
+cannot be applied is logged and skipped. For example, WAL cannot be
+enabled on a read-only database file such as the one bundled with a
+Vercel deployment, and reads from it should keep working. Before Django
+5.1 there is no transaction_mode option, so the hook also makes the
+connection start its transactions with BEGIN IMMEDIATE.
+pause_between_writes is the write serialization hook for the chunked
+batch writers.
+"""
+import logging
+import time
+import types
+
+import django
+from django.conf import settings
+from django.db import connection, DatabaseError
+
+logger = logging.getLogger(__name__)
+
+
+def _begin_immediate(self):
+    self.cursor().execute('BEGIN IMMEDIATE')
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNING:
+        return
+    if django.VERSION < (5, 1):
+        # atomic() starts its transactions through this hook on SQLite
+        connection._start_transaction_under_autocommit = types.MethodType(_begin_immediate, connection)
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            try:
+                cursor.execute(f'PRAGMA {name}={value}')
+            except DatabaseError as e:
+                logger.warning("Could not set PRAGMA %s=%s: %s", name, value, e)
+
+
+def pause_between_writes():
+    """
+    Give other writers a chance at the SQLite write lock between two chunks.
+
+    SQLite does not queue writers fairly: a waiting writer retries on a
+    back-off schedule, so a batch job that starts its next transaction right
+    after committing can keep an API request waiting until the whole run
+    ends. Batch writers call this after each committed chunk.
+    """
+    if connection.vendor == 'sqlite' and settings.SQLITE_TUNING and settings.SQLITE_WRITE_PAUSE:
+        time.sleep(settings.SQLITE_WRITE_PAUSE)
+
+
+def sqlite_status(connection):
+    """Return the current value of each tuned pragma for a SQLite connection"""
+    with connection.cursor() as cursor:
+        status = {}
+        for name in [*settings.SQLITE_PRAGMAS, 'busy_timeout']:
+            cursor.execute(f'PRAGMA {name}')
+            status[name] = cursor.fetchone()[0]
+        return status
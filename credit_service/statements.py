@@ -0,0 +1,113 @@
+"""
+Materialized loan statements.
+
+A statement is built once per change and stored as rendered JSON in
+LoanStatement, so get-statement requests are a single primary key read.
+The payment and billing code paths call invalidate_statements, which bumps
+the stored version; the next read rebuilds the statement.
+aget_statement_json serves the async view: a current statement is read
+with the async ORM, and only a rebuild runs in a worker thread.
+"""
+import json
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db.models import F, Sum
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Loan, Billing, Payment, LoanStatement
+from .schedule import project_schedule
+from .serializers import StatementResponseSerializer
+
+
+class StatementError(Exception):
+    """Raised when a statement cannot be built"""
+
+
+def invalidate_statements(loan_ids):
+    """Mark the stored statements of the given loans as stale"""
+    LoanStatement.objects.filter(loan_id__in=loan_ids).update(version=F('version') + 1)
+
+
+def build_statement(loan):
+    """Return the statement of a loan as a dict for StatementResponseSerializer"""
+    past_transactions = [
+        {
+            "date": payment_date,
+            "principal": principal_payment,
+            "interest": interest_payment,
+            "amount_paid": amount,
+        }
+        for payment_date, principal_payment, interest_payment, amount in
+        Payment.objects.filter(loan=loan).order_by('payment_date', 'created_at').values_list(
+            'payment_date', 'principal_payment', 'interest_payment', 'amount'
+        )
+    ]
+    
+    bills = list(
+        Billing.objects.filter(loan=loan)
+        .annotate(paid=Sum('payments__amount'))
+        .order_by('billing_date')
+        .values_list('due_date', 'minimum_due', 'is_paid', 'paid')
+    )
+    
+    # Bills already generated but not yet paid
+    upcoming_transactions = [
+        {"date": due_date, "amount_due": minimum_due - (paid or Decimal('0'))}
+        for due_date, minimum_due, is_paid, paid in bills
+        if not is_paid
+    ]
+    
+    # Cycles of the term that have not been billed yet
+    if loan.status == 'ACTIVE':
+        upcoming_transactions += project_schedule(
+            loan.principal_balance,
+            loan.interest_rate,
+            loan.get_next_billing_date(),
+            max(loan.term_period - len(bills), 0)
+        )
+    
+    return {"past_transactions": past_transactions, "upcoming_transactions": upcoming_transactions}
+
+
+def get_statement_json(loan_id):
+    """
+    Return the rendered statement JSON of a loan, rebuilding it if stale.
+    
+    Raises StatementError if the loan does not exist.
+    """
+    row = LoanStatement.objects.filter(loan_id=loan_id).values_list('version', 'payload_version', 'payload').first()
+    if row and row[0] == row[1]:
+        return row[2]
+    
+    try:
+        loan = Loan.objects.get(loan_id=loan_id)
+    except Loan.DoesNotExist:
+        raise StatementError("Loan not found")
+    
+    statement, _ = LoanStatement.objects.get_or_create(loan=loan)
+    version = statement.version
+    # A payment that committed before the statement row existed did not bump
+    # any version, so the loan is read again now that the version is known
+    loan.refresh_from_db()
+    payload = json.dumps(StatementResponseSerializer(build_statement(loan)).data, cls=DjangoJSONEncoder)
+    
+    # Only store the payload if no payment or billing invalidated it meanwhile
+    LoanStatement.objects.filter(loan=loan, version=version).update(
+        payload=payload,
+        payload_version=version,
+        built_at=timezone.now()
+    )
+    return payload
+
+
+async def aget_statement_json(loan_id):
+    """Async version of get_statement_json"""
+    row = await LoanStatement.objects.filter(loan_id=loan_id).values_list(
+        'version', 'payload_version', 'payload'
+    ).afirst()
+    if row and row[0] == row[1]:
+        return row[2]
+    
+    return await sync_to_async(get_statement_json)(loan_id)
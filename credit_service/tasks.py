@@ -1,70 +1,138 @@
-import pandas as pd
 from decimal import Decimal
 try:
-    from celery import shared_task
+    from celery import shared_task, group, chord
 except ImportError:
     # Provide a dummy decorator when Celery is not available
     def shared_task(func):
         return func
+    
+    # Sharded tasks run inline without Celery
+    group = chord = None
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Sum
 from django.utils import timezone
 import datetime
+import logging
 
-from .models import User, Loan, Billing, InterestAccrual
+from .models import User, Loan, Billing, InterestAccrual, IdempotencyKey
+from .ledger import refresh_ledger, get_net_balances, normalize_aadhar
+from . import transaction_cache
+from .accrual import accrue_interest
+from .billing import bill_due_loans
+from .interest import interest_for_loans
+from .statements import invalidate_statements
 
+logger = logging.getLogger(__name__)
 
-@shared_task
-def calculate_credit_score(user_id):
+
+def enqueue(task, *args):
+    """
+    Queue a task on the Celery broker, or run it inline without Celery.
+    
+    A broker failure is logged rather than raised: the caller's data is
+    already committed and the nightly tasks pick up the pending work.
+    """
+    if not hasattr(task, 'delay'):
+        return task(*args)
+    # Not loaded at startup when LAZY_IMPORTS is set
+    from bright_credit import load_celery_app
+    load_celery_app()
+    try:
+        return task.delay(*args)
+    except Exception:
+        logger.exception("Could not queue %s", getattr(task, 'name', task))
+        return None
+
+
+def score_for_balance(total_balance):
     """
-    Calculate credit score based on transactions in CSV file.
+    Map an account balance to a credit score.
     
-    Credit score calculation rules:
     - If account balance >= 1,000,000, credit score = 900
     - If account balance <= 10,000, credit score = 300
     - For intermediate values, adjust by 10 points for every Rs. 15,000
     """
+    if total_balance >= 1000000:
+        return 900
+    elif total_balance <= 10000:
+        return 300
+    
+    # Adjust score by 10 points for every Rs. 15,000
+    balance_above_min = total_balance - 10000
+    points_to_add = int(balance_above_min / 15000) * 10
+    
+    # Ensure it doesn't exceed maximum
+    return min(300 + points_to_add, 900)
+
+
+def scores_for_balances(balances):
+    """
+    Vectorized score_for_balance over a sequence of Decimal balances.
+    
+    Balances are converted to integer paise so the Rs. 15,000 steps are
+    computed exactly, matching the Decimal arithmetic of score_for_balance.
+    A None balance (no transactions) scores the minimum, as in
+    calculate_credit_score.
+    """
+    import numpy as np
+
+    paise = np.fromiter((0 if balance is None else int(balance * 100) for balance in balances), dtype=np.int64)
+    points = ((paise - 1000000) // 1500000) * 10
+    scores = np.minimum(300 + points, 900)
+    scores = np.where(paise <= 1000000, 300, scores)
+    return np.where(paise >= 100000000, 900, scores)
+
+
+def _get_net_balances(aadhar_ids):
+    """Look up balances from the backend selected by TRANSACTION_BALANCE_BACKEND"""
+    if settings.TRANSACTION_BALANCE_BACKEND == 'columnar':
+        return transaction_cache.get_net_balances(aadhar_ids)
+    
+    refresh_ledger()
+    return get_net_balances(aadhar_ids)
+
+
+@shared_task
+def refresh_transaction_ledger(force=False):
+    """
+    Fold new rows of the transactions file into the per-Aadhaar ledger.
+    """
+    try:
+        result = refresh_ledger(force=force)
+        return {"error": None, **result}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@shared_task
+def calculate_credit_score(user_id):
+    """
+    Calculate credit score based on the user's transactions.
+    
+    Balances are read from the pre-aggregated transaction ledger or the
+    columnar transaction cache, both of which are refreshed first if the
+    transactions file changed since they were built.
+    See score_for_balance for the scoring rules.
+    """
     try:
         user = User.objects.get(unique_user_id=user_id)
     except User.DoesNotExist:
         return {"error": "User not found"}
     
     try:
-        # Read CSV file
-        transactions_df = pd.read_csv(settings.TRANSACTION_CSV_PATH)
-        
-        # Filter transactions for this user
-        user_transactions = transactions_df[transactions_df['AADHAR_ID'] == user.aadhar_id]
+        total_balance = _get_net_balances([user.aadhar_id]).get(normalize_aadhar(user.aadhar_id))
         
-        if user_transactions.empty:
+        if total_balance is None:
             # No transactions found, assign minimum score
-            user.credit_score = 300
-            user.save()
-            return {"error": None, "credit_score": user.credit_score}
-        
-        # Calculate total balance (CREDIT - DEBIT)
-        credits = user_transactions[user_transactions['Transaction_type'] == 'CREDIT']['Amount'].sum()
-        debits = user_transactions[user_transactions['Transaction_type'] == 'DEBIT']['Amount'].sum()
-        total_balance = credits - debits
-        
-        # Calculate credit score based on rules
-        if total_balance >= 1000000:
-            credit_score = 900
-        elif total_balance <= 10000:
             credit_score = 300
         else:
-            # Adjust score by 10 points for every Rs. 15,000
-            balance_above_min = total_balance - 10000
-            points_to_add = int(balance_above_min / 15000) * 10
-            credit_score = 300 + points_to_add
-            
-            # Ensure it doesn't exceed maximum
-            credit_score = min(credit_score, 900)
+            credit_score = score_for_balance(total_balance)
         
         # Update user's credit score
         user.credit_score = credit_score
-        user.save()
+        user.save(update_fields=['credit_score', 'updated_at'])
         
         return {"error": None, "credit_score": credit_score}
     
@@ -72,6 +140,61 @@ def calculate_credit_score(user_id):
         return {"error": str(e)}
 
 
+def _score_users(users):
+    """Compute and bulk save credit scores for a list of users"""
+    balances = _get_net_balances([user.aadhar_id for user in users])
+    scores = scores_for_balances(
+        balances.get(normalize_aadhar(user.aadhar_id), Decimal('0')) for user in users
+    )
+    
+    now = timezone.now()
+    for user, score in zip(users, scores):
+        user.credit_score = int(score)
+        user.updated_at = now
+    User.objects.bulk_update(users, ['credit_score', 'updated_at'])
+
+
+@shared_task
+def score_users_batch(user_ids=None):
+    """
+    Calculate credit scores for many users in one pass.
+    
+    Scores the given user IDs, or every user whose credit_score is still
+    NULL when user_ids is None. Users are processed in chunks of
+    CREDIT_SCORE_BATCH_SIZE: one ledger query, one vectorized scoring pass
+    and one bulk_update per chunk.
+    """
+    batch_size = settings.CREDIT_SCORE_BATCH_SIZE
+    scored = 0
+    
+    try:
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            for start in range(0, len(user_ids), batch_size):
+                users = list(User.objects.filter(
+                    unique_user_id__in=user_ids[start:start + batch_size]
+                ).only('unique_user_id', 'aadhar_id'))
+                _score_users(users)
+                scored += len(users)
+        else:
+            # Keyset pagination, since scored users drop out of the NULL filter
+            unscored = User.objects.filter(credit_score__isnull=True).order_by('unique_user_id')
+            last_id = None
+            while True:
+                chunk = unscored if last_id is None else unscored.filter(unique_user_id__gt=last_id)
+                users = list(chunk.only('unique_user_id', 'aadhar_id')[:batch_size])
+                if not users:
+                    break
+                _score_users(users)
+                scored += len(users)
+                last_id = users[-1].unique_user_id
+        
+        return {"error": None, "users_scored": scored}
+    
+    except Exception as e:
+        return {"error": str(e), "users_scored": scored}
+
+
 @shared_task
 def run_daily_billing():
     """
@@ -81,24 +204,41 @@ def run_daily_billing():
     today = timezone.now().date()
     results = []
     
-    # Find all active loans
-    active_loans = Loan.objects.filter(status='ACTIVE')
+    # Only loans whose next billing date is today, via the next_billing_date index
+    due_loan_ids = Loan.objects.filter(status='ACTIVE', next_billing_date=today).values_list('loan_id', flat=True)
     
-    for loan in active_loans:
-        next_billing_date = loan.get_next_billing_date()
-        
-        # Check if today is a billing date for this loan
-        if next_billing_date == today:
-            result = generate_billing_for_loan(loan.loan_id)
-            results.append(result)
+    for loan_id in due_loan_ids:
+        result = generate_billing_for_loan(loan_id, expected_billing_date=today)
+        results.append(result)
     
     return results
 
 
 @shared_task
-def generate_billing_for_loan(loan_id):
+def run_daily_billing_batch(batch_size=None):
+    """
+    Batch mode of run_daily_billing.
+    
+    Bills every loan due today in chunks with bulk inserts and updates
+    instead of one task and transaction per loan. Several workers can run
+    this at once; loans locked by one worker are skipped by the others.
+    """
+    today = timezone.now().date()
+    
+    try:
+        counts = bill_due_loans(today, batch_size=batch_size)
+        return {"error": None, "billing_date": today.isoformat(), **counts}
+    except Exception as e:
+        return {"error": str(e), "billing_date": today.isoformat()}
+
+
+@shared_task
+def generate_billing_for_loan(loan_id, expected_billing_date=None):
     """
     Generate billing for a specific loan.
+    
+    When expected_billing_date is given the loan is only billed if that is
+    its next billing date, so a retried caller never bills a cycle twice.
     """
     try:
         with transaction.atomic():
@@ -108,21 +248,28 @@ def generate_billing_for_loan(loan_id):
                 return {"error": "Loan is not active", "loan_id": str(loan_id)}
             
             billing_date = loan.get_next_billing_date()
+            if expected_billing_date is not None and billing_date != expected_billing_date:
+                return {"error": None, "loan_id": str(loan_id), "skipped": True}
             due_date = loan.get_due_date(billing_date)
             
-            # Calculate interest accrued since last billing date or loan disbursement
-            last_billing = loan.billings.order_by('-billing_date').first()
-            start_date = last_billing.billing_date + datetime.timedelta(days=1) if last_billing else loan.disbursement_date + datetime.timedelta(days=1)
+            # Interest accrued since the last billing date or loan disbursement. The
+            # next billing date is always 30 days after that, so the window is the
+            # 30 days ending on billing_date and no billing lookup is needed.
+            start_date = billing_date - datetime.timedelta(days=29)
             end_date = billing_date
             
-            # Get all interest accruals for this period
             interest_accruals = loan.interest_accruals.filter(
+                billing__isnull=True,
                 accrual_date__gte=start_date,
                 accrual_date__lte=end_date
             )
             
-            # Sum up all interest for this period
-            total_interest = sum(accrual.interest_amount for accrual in interest_accruals)
+            if settings.INTEREST_ENGINE == 'events':
+                # Closed form over the loan's balance events
+                total_interest = interest_for_loans([(loan.loan_id, loan.interest_rate)], start_date, end_date)[loan.loan_id]
+            else:
+                # Sum up all interest for this period in the database
+                total_interest = interest_accruals.aggregate(total=Sum('interest_amount'))['total'] or Decimal('0')
             
             # Calculate minimum due
             min_due = loan.calculate_min_due(total_interest)
@@ -141,6 +288,11 @@ def generate_billing_for_loan(loan_id):
             # Link interest accruals to this billing
             interest_accruals.update(billing=billing)
             
+            # Schedule the next cycle
+            loan.next_billing_date = billing_date + datetime.timedelta(days=30)
+            loan.save(update_fields=['next_billing_date', 'updated_at'])
+            invalidate_statements([loan.loan_id])
+            
             return {
                 "error": None,
                 "loan_id": str(loan_id),
@@ -160,46 +312,138 @@ def generate_billing_for_loan(loan_id):
 def accrue_daily_interest():
     """
     Daily task to accrue interest for all active loans.
+    
+    Returns aggregate counts rather than a per-loan result list.
     """
     today = timezone.now().date()
-    results = []
     
-    # Find all active loans
-    active_loans = Loan.objects.filter(status='ACTIVE')
+    try:
+        counts = accrue_interest(today)
+        return {"error": None, "accrual_date": today.isoformat(), **counts}
+    except Exception as e:
+        return {"error": str(e), "accrual_date": today.isoformat()}
+
+
+def _active_loan_shards(shard_size):
+    """
+    Split active loans into keyset ranges of about shard_size loans.
     
-    for loan in active_loans:
-        # Skip if interest already accrued for today
-        if InterestAccrual.objects.filter(loan=loan, accrual_date=today).exists():
-            continue
-        
-        try:
-            with transaction.atomic():
-                # Recalculate with lock to prevent race conditions
-                loan = Loan.objects.select_for_update().get(loan_id=loan.loan_id)
-                
-                # Calculate daily interest
-                daily_rate = loan.daily_interest_rate()
-                interest_amount = (loan.principal_balance * daily_rate) / Decimal('100')
-                
-                # Record interest accrual
-                InterestAccrual.objects.create(
-                    loan=loan,
-                    accrual_date=today,
-                    principal_balance=loan.principal_balance,
-                    daily_interest_rate=daily_rate,
-                    interest_amount=interest_amount
-                )
-                
-                results.append({
-                    "error": None,
-                    "loan_id": str(loan.loan_id),
-                    "interest_amount": float(interest_amount)
-                })
-                
-        except Exception as e:
-            results.append({
-                "error": str(e),
-                "loan_id": str(loan.loan_id)
-            })
-    
-    return results 
\ No newline at end of file
+    Returns a list of (lower, upper) loan ID bounds, with lower inclusive,
+    upper exclusive and None for an open end. The first shard is open below,
+    so a loan whose ID sorts before the first bound, such as one created
+    after the split, is not left out.
+    """
+    loan_ids = Loan.objects.filter(status='ACTIVE').order_by('loan_id').values_list('loan_id', flat=True)
+    lower_bounds = [
+        str(loan_id)
+        for index, loan_id in enumerate(loan_ids.iterator(chunk_size=shard_size))
+        if index % shard_size == 0
+    ]
+    upper_bounds = lower_bounds[1:] + [None]
+    if lower_bounds:
+        lower_bounds[0] = None
+    return list(zip(lower_bounds, upper_bounds))
+
+
+def _loans_in_shard(lower, upper):
+    loans = Loan.objects.all()
+    if lower is not None:
+        loans = loans.filter(loan_id__gte=lower)
+    if upper is not None:
+        loans = loans.filter(loan_id__lt=upper)
+    return loans
+
+
+def _fan_out(shard_task, run_date, shard_size=None, inline=False):
+    """
+    Run shard_task over every active loan shard and aggregate the results.
+    
+    With Celery the shards are dispatched as a chord whose callback is
+    aggregate_shard_results; without Celery (or with inline=True) they run
+    one after another in this process.
+    """
+    shard_size = shard_size or settings.LOAN_SHARD_SIZE
+    shards = _active_loan_shards(shard_size)
+    
+    if chord is None or inline or not shards:
+        results = [shard_task(run_date, lower, upper) for lower, upper in shards]
+        return aggregate_shard_results(results)
+    
+    header = group(shard_task.s(run_date, lower, upper) for lower, upper in shards)
+    result = chord(header)(aggregate_shard_results.s())
+    return {"error": None, "shards": len(shards), "result_id": result.id}
+
+
+@shared_task
+def aggregate_shard_results(results):
+    """
+    Chord callback summing the counts reported by shard tasks.
+    """
+    totals = {"error": None, "shards": len(results), "errors": []}
+    for result in results:
+        for key, value in result.items():
+            if key == "error":
+                if value:
+                    totals["errors"].append(value)
+            elif key == "errors":
+                totals["errors"].extend(value)
+            elif isinstance(value, int):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+@shared_task
+def accrue_interest_shard(accrual_date, lower, upper):
+    """
+    Accrue interest for the active loans in one loan ID range.
+    
+    Safe to retry: loans already accrued for the day are skipped.
+    """
+    accrual_date = datetime.date.fromisoformat(accrual_date)
+    try:
+        return {"error": None, **accrue_interest(accrual_date, loans=_loans_in_shard(lower, upper))}
+    except Exception as e:
+        return {"error": f"Shard {lower}: {e}"}
+
+
+@shared_task
+def run_billing_shard(billing_date, lower, upper):
+    """
+    Generate billings due on billing_date for the loans in one loan ID range.
+    
+    Safe to retry: a loan already billed for the cycle has moved on to its
+    next billing date and is not selected again.
+    """
+    billing_date = datetime.date.fromisoformat(billing_date)
+    try:
+        return {"error": None, **bill_due_loans(billing_date, loans=_loans_in_shard(lower, upper))}
+    except Exception as e:
+        return {"error": f"Shard {lower}: {e}"}
+
+
+@shared_task
+def accrue_daily_interest_sharded(shard_size=None, inline=False):
+    """
+    Fan daily interest accrual out over Celery workers in loan ID shards.
+    """
+    today = timezone.now().date()
+    return _fan_out(accrue_interest_shard, today.isoformat(), shard_size, inline)
+
+
+@shared_task
+def run_daily_billing_sharded(shard_size=None, inline=False):
+    """
+    Fan daily billing out over Celery workers in loan ID shards.
+    """
+    today = timezone.now().date()
+    return _fan_out(run_billing_shard, today.isoformat(), shard_size, inline)
+
+
+@shared_task
+def purge_expired_idempotency_keys():
+    """
+    Delete stored Idempotency-Key responses past their TTL.
+    This should be scheduled to run periodically.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return {"error": None, "deleted": deleted}
@@ -0,0 +1,770 @@
+import base64
+import datetime
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from decimal import Decimal
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api.adapter import event_to_environ, to_response
+
+from . import transaction_cache
+from .accrual import accrue_interest, _insert as insert_accruals
+from .billing import bill_due_loans
+from .interest import interest_between, loan_events
+from .loan_import import import_loans
+from .management.commands.profile_startup import profile_imports
+from .models import (
+    User, Loan, Billing, Payment, InterestAccrual, IdempotencyKey, LoanStatement, BalanceEvent,
+    daily_interest_for, daily_interest_rate_for,
+)
+from .payments import PaymentError, make_payment
+from .schedule import project_schedule, project_schedules
+from .serializers import StatementResponseSerializer
+from .statements import build_statement, get_statement_json
+from .tasks import (
+    _active_loan_shards, _loans_in_shard, generate_billing_for_loan, score_for_balance, scores_for_balances,
+)
+
+TRANSACTIONS_CSV = """AADHAR_ID,Date,Amount,Transaction_type
+123456789012,2023-01-01,5000,CREDIT
+123456789012,2023-01-15,2000,DEBIT
+987654321098,2023-02-01,700,CREDIT
+"""
+
+
+def make_loan(principal=Decimal('1000.00'), disbursement_date=datetime.date(2024, 1, 1), **kwargs):
+    """Create a user with one active credit card loan"""
+    index = User.objects.count()
+    user = User.objects.create(
+        aadhar_id=f'{index:012d}', name=f'User {index}', email=f'user{index}@example.com',
+        annual_income=Decimal('600000'), credit_score=800,
+    )
+    return Loan.objects.create(
+        user=user, loan_type='CC', loan_amount=principal, interest_rate=Decimal('18.00'), term_period=12,
+        disbursement_date=disbursement_date, principal_balance=principal, **kwargs
+    )
+
+
+class TransactionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.csv_path = os.path.join(self.tmp.name, 'transactions.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write(TRANSACTIONS_CSV)
+        self.cache_dir = os.path.join(self.tmp.name, 'cache', 'transactions')
+        self.addCleanup(transaction_cache._loaded.clear)
+
+    def test_balances(self):
+        with override_settings(TRANSACTION_CSV_PATH=self.csv_path, TRANSACTION_CACHE_DIR=self.cache_dir):
+            balances = transaction_cache.get_net_balances(['123456789012', '987654321098', '111111111111'])
+        self.assertEqual(balances, {'123456789012': 3000, '987654321098': 700})
+
+    def test_rebuild_never_hides_the_cache(self):
+        """Readers opening the cache while it is rebuilt always find a complete version"""
+        transaction_cache.build_cache(self.csv_path, self.cache_dir)
+        stop = threading.Event()
+        failures = []
+
+        def read():
+            while not stop.is_set():
+                version = os.path.realpath(self.cache_dir)
+                try:
+                    for name in transaction_cache.ARRAYS:
+                        open(os.path.join(version, f'{name}.npy'), 'rb').close()
+                except FileNotFoundError:
+                    # The version was retired after it was resolved; only a
+                    # missing cache_dir would be a failure
+                    if not os.path.exists(self.cache_dir):
+                        failures.append(version)
+                if transaction_cache._read_manifest(self.cache_dir) is None:
+                    failures.append(self.cache_dir)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for _ in range(30):
+                transaction_cache.build_cache(self.csv_path, self.cache_dir)
+        finally:
+            stop.set()
+            reader.join()
+
+        self.assertEqual(failures, [])
+        self.assertTrue(os.path.islink(self.cache_dir))
+        # Retired versions are removed, leaving only the current one
+        versions = [name for name in os.listdir(os.path.dirname(self.cache_dir)) if name != 'transactions']
+        self.assertEqual(versions, [os.path.basename(os.path.realpath(self.cache_dir))])
+
+    def test_replaces_a_plain_cache_directory(self):
+        os.makedirs(self.cache_dir)
+        transaction_cache.build_cache(self.csv_path, self.cache_dir)
+        self.assertTrue(os.path.islink(self.cache_dir))
+        self.assertIsNotNone(transaction_cache._read_manifest(self.cache_dir))
+
+
+class LoanTests(TestCase):
+    def test_loan_is_not_saved_without_its_disbursement_event(self):
+        with mock.patch.object(BalanceEvent.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                make_loan()
+        self.assertFalse(Loan.objects.exists())
+        loan = make_loan()
+        self.assertEqual(list(BalanceEvent.objects.filter(loan=loan).values_list('event_type', 'amount')),
+                         [('DISBURSEMENT', loan.principal_balance)])
+
+
+class AccrualTests(TestCase):
+    def setUp(self):
+        self.loans = [make_loan() for _ in range(3)]
+        self.day = datetime.date(2024, 1, 2)
+
+    def test_rerun_counts_only_new_rows(self):
+        self.assertEqual(accrue_interest(self.day), {"loans_processed": 3, "accruals_created": 3, "already_accrued": 0})
+        InterestAccrual.objects.filter(loan=self.loans[0]).delete()
+        self.assertEqual(accrue_interest(self.day), {"loans_processed": 3, "accruals_created": 1, "already_accrued": 2})
+        self.assertEqual(InterestAccrual.objects.filter(accrual_date=self.day).count(), 3)
+
+    def test_rows_recorded_after_the_precheck_are_not_counted(self):
+        """A concurrent run inserting the same (loan, date) pairs makes the chunk fall back row by row"""
+        accrue_interest(self.day, loans=Loan.objects.filter(pk=self.loans[0].pk))
+        accruals = [
+            InterestAccrual(loan=loan, accrual_date=self.day, principal_balance=loan.principal_balance,
+                            daily_interest_rate=Decimal('0.049'), interest_amount=Decimal('0.49'))
+            for loan in self.loans
+        ]
+        self.assertEqual(insert_accruals(accruals), 2)
+        self.assertEqual(InterestAccrual.objects.filter(accrual_date=self.day).count(), 3)
+
+
+class BillingEngineTests(TestCase):
+    """bill_due_loans must bill exactly like generate_billing_for_loan"""
+
+    principals = [Decimal('1000.00'), Decimal('12345.67'), Decimal('999.99')]
+    billing_date = datetime.date(2024, 1, 31)
+
+    def setUp(self):
+        # One loan per principal for each engine; accruals start a day before the billing window
+        self.bulk = [make_loan(principal) for principal in self.principals]
+        self.single = [make_loan(principal) for principal in self.principals]
+        for offset in range(31):
+            accrue_interest(datetime.date(2024, 1, 1) + datetime.timedelta(days=offset))
+
+    def billed(self, loan):
+        bill = Billing.objects.get(loan=loan)
+        accruals = InterestAccrual.objects.filter(billing=bill).order_by('accrual_date')
+        return {
+            "billing_date": bill.billing_date,
+            "due_date": bill.due_date,
+            "principal_amount": bill.principal_amount,
+            "interest_amount": bill.interest_amount,
+            "minimum_due": bill.minimum_due,
+            "total_due": bill.total_due,
+            "accrual_dates": list(accruals.values_list('accrual_date', flat=True)),
+            "next_billing_date": Loan.objects.get(pk=loan.pk).next_billing_date,
+        }
+
+    def run_both(self):
+        bulk_ids = [loan.pk for loan in self.bulk]
+        self.assertEqual(bill_due_loans(self.billing_date, loans=Loan.objects.filter(pk__in=bulk_ids)),
+                         {"loans_billed": len(self.bulk)})
+        for loan in self.single:
+            self.assertIsNone(generate_billing_for_loan(loan.pk, expected_billing_date=self.billing_date)['error'])
+
+    def test_bulk_and_single_loan_billing_match(self):
+        for engine in ('daily', 'events'):
+            with self.subTest(engine=engine), override_settings(INTEREST_ENGINE=engine), transaction.atomic():
+                self.run_both()
+                for bulk, single in zip(self.bulk, self.single):
+                    billed = self.billed(bulk)
+                    self.assertEqual(billed, self.billed(single))
+                    self.assertGreater(billed["interest_amount"], 0)
+                    self.assertEqual(billed["next_billing_date"], datetime.date(2024, 3, 1))
+                    if engine == 'daily':
+                        self.assertEqual(billed["accrual_dates"][0], datetime.date(2024, 1, 2))
+                        self.assertEqual(len(billed["accrual_dates"]), 30)
+                transaction.set_rollback(True)
+
+    def test_second_run_bills_nothing(self):
+        self.run_both()
+        self.assertEqual(bill_due_loans(self.billing_date), {"loans_billed": 0})
+        for loan in self.single:
+            self.assertTrue(generate_billing_for_loan(loan.pk, expected_billing_date=self.billing_date)['skipped'])
+        self.assertEqual(Billing.objects.count(), len(self.bulk) + len(self.single))
+
+
+@unittest.skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... SKIP LOCKED")
+class BillingSkipLockedTests(TransactionTestCase):
+    def test_locked_loan_is_skipped_and_billed_once(self):
+        loans = [make_loan() for _ in range(3)]
+        billing_date = loans[0].next_billing_date
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Loan.objects.select_for_update().get(pk=loans[0].pk)
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            self.assertEqual(bill_due_loans(billing_date), {"loans_billed": 2})
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertFalse(Billing.objects.filter(loan=loans[0]).exists())
+        self.assertEqual(bill_due_loans(billing_date), {"loans_billed": 1})
+        self.assertEqual(bill_due_loans(billing_date), {"loans_billed": 0})
+        for loan in loans:
+            self.assertEqual(Billing.objects.filter(loan=loan).count(), 1)
+
+
+class ShardTests(TestCase):
+    def test_every_active_loan_lands_in_one_shard(self):
+        loans = [make_loan() for _ in range(7)]
+        make_loan(status='CLOSED')
+        shards = _active_loan_shards(3)
+        self.assertEqual(len(shards), 3)
+        self.assertIsNone(shards[0][0])
+        self.assertIsNone(shards[-1][1])
+
+        # A loan created after the split sorts before every bound
+        loans.append(make_loan(loan_id=uuid.UUID(int=0)))
+        sharded = [loan_id for lower, upper in shards for loan_id in
+                   _loans_in_shard(lower, upper).filter(status='ACTIVE').values_list('loan_id', flat=True)]
+        self.assertCountEqual(sharded, [loan.loan_id for loan in loans])
+
+
+class InterestEngineTests(TestCase):
+    start = datetime.date(2024, 1, 1)
+
+    def days(self, first, last):
+        return [self.start + datetime.timedelta(days=offset) for offset in range(first, last + 1)]
+
+    def assertEnginesAgree(self, loan, first, last):
+        rows = InterestAccrual.objects.filter(loan=loan, accrual_date__range=(first, last))
+        rows_total = sum(rows.values_list('interest_amount', flat=True), Decimal('0'))
+        events = loan_events([loan.loan_id], last)[loan.loan_id]
+        self.assertEqual(rows_total, interest_between(events, loan.interest_rate, first, last))
+
+    def test_payment_after_the_day_was_accrued(self):
+        loan = make_loan(Decimal('10000.00'), self.start)
+        payment_day = self.start + datetime.timedelta(days=2)
+        for day in self.days(0, 2):
+            accrue_interest(day)
+        make_payment(loan.loan_id, Decimal('4000.00'), payment_date=payment_day)
+        for day in self.days(3, 5):
+            accrue_interest(day)
+
+        accrual = InterestAccrual.objects.get(loan=loan, accrual_date=payment_day)
+        self.assertEqual(accrual.principal_balance, Decimal('6000.00'))
+        self.assertEnginesAgree(loan, self.start, self.days(5, 5)[0])
+
+    def test_payment_before_the_day_was_accrued(self):
+        loan = make_loan(Decimal('10000.00'), self.start)
+        for day in self.days(0, 1):
+            accrue_interest(day)
+        make_payment(loan.loan_id, Decimal('2500.00'), payment_date=self.days(2, 2)[0])
+        for day in self.days(2, 5):
+            accrue_interest(day)
+        self.assertEnginesAgree(loan, self.start, self.days(5, 5)[0])
+
+    def test_payment_that_closes_the_loan(self):
+        loan = make_loan(Decimal('1000.00'), self.start)
+        for day in self.days(0, 2):
+            accrue_interest(day)
+        make_payment(loan.loan_id, Decimal('1000.00'), payment_date=self.days(2, 2)[0])
+        self.assertEqual(
+            InterestAccrual.objects.get(loan=loan, accrual_date=self.days(2, 2)[0]).interest_amount, Decimal('0.00')
+        )
+        self.assertEnginesAgree(loan, self.start, self.days(2, 2)[0])
+
+    def test_daily_interest_rounds_half_up(self):
+        self.assertEqual(daily_interest_for(Decimal('1000.00'), Decimal('0.0005')), Decimal('0.01'))
+        self.assertEqual(daily_interest_for(Decimal('1000.00'), Decimal('0.00049')), Decimal('0.00'))
+
+
+class ConcurrentPaymentTests(TransactionTestCase):
+    """Concurrent payments to one loan must be allocated as if they ran one after another"""
+
+    threads = 8
+
+    def setUp(self):
+        self.loan = make_loan(Decimal('2000.00'), datetime.date(2024, 1, 1))
+        self.bills = [
+            Billing.objects.create(
+                loan=self.loan, billing_date=billing_date, due_date=billing_date + datetime.timedelta(days=15),
+                principal_amount=Decimal('2000.00'), interest_amount=Decimal('100.00'),
+                minimum_due=Decimal('160.00'), total_due=Decimal('2100.00'),
+            )
+            for billing_date in (datetime.date(2024, 1, 31), datetime.date(2024, 3, 1))
+        ]
+        self.payable = self.loan.principal_balance + sum(bill.interest_amount for bill in self.bills)
+
+    def pay_concurrently(self, amount):
+        """Make one payment of amount per thread at the same moment; return (accepted, rejected)"""
+        barrier = threading.Barrier(self.threads)
+        accepted = []
+        rejected = []
+
+        def pay():
+            try:
+                barrier.wait()
+                make_payment(self.loan.loan_id, amount)
+                accepted.append(amount)
+            except PaymentError as e:
+                rejected.append(str(e))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=pay) for _ in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return accepted, rejected
+
+    def assertLedgerConsistent(self, accepted):
+        loan = Loan.objects.get(pk=self.loan.pk)
+        payments = Payment.objects.filter(loan=loan)
+        paid = sum(payments.values_list('amount', flat=True), Decimal('0'))
+        principal_paid = sum(payments.values_list('principal_payment', flat=True), Decimal('0'))
+        interest_paid = sum(payments.values_list('interest_payment', flat=True), Decimal('0'))
+
+        self.assertEqual(paid, sum(accepted, Decimal('0')))
+        self.assertEqual(paid, principal_paid + interest_paid)
+        self.assertLessEqual(paid, self.payable)
+        self.assertEqual(loan.principal_balance, self.loan.loan_amount - principal_paid)
+        self.assertGreaterEqual(loan.principal_balance, 0)
+        self.assertEqual(loan.status, 'CLOSED' if loan.principal_balance == 0 else 'ACTIVE')
+
+        for bill in Billing.objects.filter(loan=loan):
+            bill_payments = bill.payments.all()
+            bill_paid = sum(bill_payments.values_list('amount', flat=True), Decimal('0'))
+            bill_interest = sum(bill_payments.values_list('interest_payment', flat=True), Decimal('0'))
+            self.assertLessEqual(bill_paid, bill.minimum_due)
+            self.assertLessEqual(bill_interest, bill.interest_amount)
+            self.assertEqual(bill.is_paid, bill_paid == bill.minimum_due)
+
+    def test_small_payments_all_apply(self):
+        accepted, rejected = self.pay_concurrently(Decimal('70.00'))
+        self.assertEqual(rejected, [])
+        self.assertLedgerConsistent(accepted)
+        # 560 covers both minimum dues (320); the rest went to principal
+        self.assertTrue(all(bill.is_paid for bill in Billing.objects.filter(loan=self.loan)))
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).principal_balance, Decimal('1640.00'))
+
+    def test_payments_never_exceed_the_balance(self):
+        accepted, rejected = self.pay_concurrently(Decimal('700.00'))
+        # Only three payments of 700 fit into the 2200 payable
+        self.assertEqual(len(accepted), 3)
+        self.assertEqual(rejected, ["Payment exceeds the outstanding balance"] * (self.threads - 3))
+        self.assertLedgerConsistent(accepted)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "SQLite only")
+class SQLiteTuningTests(TransactionTestCase):
+    def test_transactions_take_the_write_lock_when_they_begin(self):
+        other = sqlite3.connect(connection.settings_dict['NAME'], timeout=0, isolation_level=None)
+        try:
+            with transaction.atomic():
+                with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                    other.execute('BEGIN IMMEDIATE')
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+        finally:
+            other.close()
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.loan = make_loan()
+        self.body = {"loan_id": str(self.loan.loan_id), "amount": "100.00"}
+
+    def pay(self, key='key-1'):
+        return self.client.post('/api/make-payment/', self.body, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def reserve(self, expires_at):
+        """A reservation left behind by a request that has not committed"""
+        return IdempotencyKey.objects.create(
+            endpoint='make-payment', key='key-1', expires_at=expires_at,
+            request_hash=hashlib.sha256(json.dumps(self.body).encode()).hexdigest(),
+        )
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.pay()
+        retry = self.pay()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(Payment.objects.filter(loan=self.loan).count(), 1)
+
+    def test_reservation_in_flight_gets_409(self):
+        self.reserve(timezone.now() + datetime.timedelta(seconds=30))
+        self.assertEqual(self.pay().status_code, 409)
+        self.assertFalse(Payment.objects.filter(loan=self.loan).exists())
+
+    def test_reservation_is_a_short_lease(self):
+        leases = []
+
+        def record_lease(*args, **kwargs):
+            leases.append(IdempotencyKey.objects.get(key='key-1').expires_at)
+            return make_payment(*args, **kwargs)
+
+        with mock.patch('credit_service.views.make_payment', side_effect=record_lease):
+            self.pay()
+        self.assertLessEqual(leases[0], timezone.now() + datetime.timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS))
+        # Once the response is stored the key is kept for the full TTL
+        self.assertGreater(IdempotencyKey.objects.get(key='key-1').expires_at, timezone.now() + datetime.timedelta(hours=1))
+
+    def test_abandoned_reservation_is_taken_over_after_its_lease(self):
+        self.reserve(timezone.now() - datetime.timedelta(seconds=1))
+        self.assertEqual(self.pay().status_code, 200)
+        self.assertEqual(Payment.objects.filter(loan=self.loan).count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(key='key-1').response_status, 200)
+
+    def test_request_that_lost_its_lease_is_rolled_back(self):
+        def taken_over(*args, **kwargs):
+            payments = make_payment(*args, **kwargs)
+            # A retry took the key over while this request was still running
+            IdempotencyKey.objects.filter(key='key-1').delete()
+            return payments
+
+        with mock.patch('credit_service.views.make_payment', side_effect=taken_over):
+            self.assertEqual(self.pay().status_code, 409)
+        self.assertFalse(Payment.objects.filter(loan=self.loan).exists())
+        self.assertEqual(Loan.objects.get(pk=self.loan.pk).principal_balance, self.loan.principal_balance)
+
+    def test_key_released_while_reserving_is_reserved_again(self):
+        holder = self.reserve(timezone.now() + datetime.timedelta(seconds=30))
+        get = IdempotencyKey.objects.get
+
+        def released_first(*args, **kwargs):
+            if IdempotencyKey.objects.filter(pk=holder.pk).exists():
+                # The holder's server error releases the key after this request's insert failed
+                holder.delete()
+                raise IdempotencyKey.DoesNotExist
+            return get(*args, **kwargs)
+
+        with mock.patch.object(IdempotencyKey.objects, 'get', side_effect=released_first):
+            self.assertEqual(self.pay().status_code, 200)
+        self.assertEqual(Payment.objects.filter(loan=self.loan).count(), 1)
+        self.assertEqual(IdempotencyKey.objects.get(key='key-1').response_status, 200)
+
+
+def decimal_schedule(principal_balance, interest_rate, first_billing_date, cycles):
+    """The per-cycle Decimal projection that project_schedules replaced"""
+    daily_rate = daily_interest_rate_for(interest_rate)
+    principal = principal_balance
+    schedule = []
+    for cycle in range(cycles):
+        billing_date = first_billing_date + datetime.timedelta(days=30 * cycle)
+        principal_portion = (principal * Decimal('0.03')).quantize(Decimal('0.01'))
+        schedule.append({
+            "date": billing_date + datetime.timedelta(days=15),
+            "amount_due": principal_portion + 30 * daily_interest_for(principal, daily_rate),
+        })
+        principal -= principal_portion
+    return schedule
+
+
+class ScheduleTests(SimpleTestCase):
+    first_billing_date = datetime.date(2024, 1, 31)
+    # 3% of 0.50 and 1.50 is half a paisa (rounded half-even); 500.00 at 12% or 18%,
+    # 5.00 at 36.5% and 250.00 at 99.99% earn exactly half a paisa a day (rounded half-up)
+    principals = ['0.00', '0.01', '0.50', '1.50', '5.00', '250.00', '500.00', '1000.00', '12345.67', '99999999.99']
+    rates = ['0', '12', '18', '36.5', '99.99']
+    tenures = [0, 1, 12, 60]
+
+    def cases(self):
+        rng = random.Random(15)
+        for principal in self.principals:
+            for rate in self.rates:
+                for tenure in self.tenures:
+                    yield Decimal(principal), Decimal(rate), tenure
+        for _ in range(300):
+            yield Decimal(rng.randint(0, 10 ** 9)).scaleb(-2), Decimal(rng.randint(0, 9999)).scaleb(-2), rng.randint(0, 60)
+
+    def test_matches_the_decimal_projection(self):
+        for principal, rate, tenure in self.cases():
+            with self.subTest(principal=principal, rate=rate, tenure=tenure):
+                self.assertEqual(
+                    project_schedule(principal, rate, self.first_billing_date, tenure),
+                    decimal_schedule(principal, rate, self.first_billing_date, tenure)
+                )
+
+    def test_batch_projection_masks_each_loan_to_its_tenure(self):
+        cases = list(self.cases())
+        due_dates, amounts, mask = project_schedules(
+            [principal for principal, _, _ in cases], [rate for _, rate, _ in cases],
+            [self.first_billing_date] * len(cases), [tenure for _, _, tenure in cases]
+        )
+        for index, (principal, rate, tenure) in enumerate(cases):
+            expected = decimal_schedule(principal, rate, self.first_billing_date, tenure)
+            self.assertEqual(int(mask[index].sum()), tenure)
+            self.assertEqual([due_date.item() for due_date in due_dates[index][mask[index]]],
+                             [row["date"] for row in expected])
+            self.assertEqual([Decimal(int(amount)).scaleb(-2) for amount in amounts[index][mask[index]]],
+                             [row["amount_due"] for row in expected])
+
+
+class CreditScoreTests(SimpleTestCase):
+    def test_vectorized_scores_match_score_for_balance(self):
+        balances = [
+            Decimal('-250000.00'), Decimal('-0.01'), Decimal('0'), Decimal('9999.99'), Decimal('10000'),
+            Decimal('10000.01'), Decimal('10000.001'), Decimal('999999.99'), Decimal('1000000'),
+            Decimal('1000000.01'), Decimal('25000000'),
+        ]
+        # Either side of every Rs. 15,000 step up to the maximum score
+        for step in range(1, 67):
+            boundary = Decimal(10000 + 15000 * step)
+            balances += [boundary - Decimal('0.01'), boundary, boundary + Decimal('0.01')]
+
+        scores = [int(score) for score in scores_for_balances(balances)]
+        self.assertEqual(scores, [score_for_balance(balance) for balance in balances])
+        self.assertEqual(scores[:11], [300, 300, 300, 300, 300, 300, 300, 900, 900, 900, 900])
+        self.assertEqual(scores_for_balances([None, Decimal('40000')]).tolist(), [300, 320])
+
+
+class ServerlessAdapterTests(SimpleTestCase):
+    def test_base64_body(self):
+        body = json.dumps({"name": "Zoë"}).encode('utf-8')
+        environ = event_to_environ({
+            'httpMethod': 'post', 'path': '/api/register-user/', 'isBase64Encoded': True,
+            'body': base64.b64encode(body).decode('ascii'),
+            'headers': {'Content-Type': 'application/json', 'Content-Length': '3'},
+        })
+        self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+        self.assertEqual(environ['CONTENT_TYPE'], 'application/json')
+        self.assertEqual(environ['CONTENT_LENGTH'], str(len(body)))
+        self.assertEqual(environ['wsgi.input'].read(), body)
+
+    def query(self, event):
+        return dict(WSGIRequest(event_to_environ({'path': '/api/get-statement/', **event})).GET.lists())
+
+    def test_query_strings(self):
+        expected = {'loan_id': ['a&b'], 'x': ['1', '2']}
+        self.assertEqual(self.query({'rawQueryString': 'loan_id=a%26b&x=1&x=2'}), expected)
+        self.assertEqual(self.query({'path': '/api/get-statement/?loan_id=a%26b&x=1&x=2'}), expected)
+        self.assertEqual(self.query({'queryStringParameters': {'loan_id': 'a&b', 'x': '2'}}),
+                         {'loan_id': ['a&b'], 'x': ['2']})
+        self.assertEqual(self.query({
+            'queryStringParameters': {'loan_id': 'a&b', 'x': '2'},
+            'multiValueQueryStringParameters': {'loan_id': ['a&b'], 'x': ['1', '2']},
+        }), expected)
+
+    def test_non_ascii_path(self):
+        for path in ('/api/caf%C3%A9/', '/api/café/'):
+            with self.subTest(path=path):
+                environ = event_to_environ({'path': path})
+                self.assertEqual(environ['PATH_INFO'], '/api/caf\xc3\xa9/')
+                self.assertEqual(WSGIRequest(environ).path, '/api/café/')
+
+    def test_repeated_headers(self):
+        response = to_response(200, [
+            ('Content-Type', 'application/json'), ('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2'),
+        ], b'{}')
+        self.assertEqual(response['multiValueHeaders'], {'Set-Cookie': ['a=1', 'b=2']})
+        self.assertEqual(response['headers']['Content-Type'], 'application/json')
+        self.assertEqual(response['body'], '{}')
+        self.assertFalse(response['isBase64Encoded'])
+
+    def test_binary_responses_are_base64_encoded(self):
+        for content_type, body in (('application/pdf', b'%PDF\x00\xff'), ('text/csv', b'caf\xe9')):
+            with self.subTest(content_type=content_type):
+                response = to_response(200, [('Content-Type', content_type)], body)
+                self.assertTrue(response['isBase64Encoded'])
+                self.assertEqual(base64.b64decode(response['body']), body)
+
+
+class LoanImportTests(TestCase):
+    def setUp(self):
+        self.user = make_loan().user
+
+    def record(self, **fields):
+        return {
+            "unique_user_id": str(self.user.unique_user_id), "loan_type": "CC", "loan_amount": "4000",
+            "interest_rate": "18", "term_period": "12", "disbursement_date": "2024-02-01", **fields,
+        }
+
+    def test_values_that_do_not_fit_their_column_are_rejected(self):
+        records = [
+            self.record(loan_amount="NaN"),
+            self.record(loan_amount="100.005"),
+            self.record(interest_rate="1000"),
+            self.record(term_period=str(10 ** 20)),
+            self.record(principal_balance="1e-7"),
+            self.record(),
+        ]
+        created, errors = import_loans(enumerate(records, start=1), as_of=datetime.date(2024, 3, 1))
+        self.assertEqual(created, 1)
+        self.assertEqual(sorted(errors), [1, 2, 3, 4, 5])
+        for row, error in errors.items():
+            self.assertTrue(error.startswith("Invalid"), (row, error))
+
+    def test_rerunning_a_file_does_not_duplicate_loans(self):
+        records = [(1, self.record()), (2, self.record()), (3, self.record(loan_amount="4500"))]
+        self.assertEqual(import_loans(records, batch_size=2), (2, {2: "Loan already exists"}))
+        self.assertEqual(import_loans(records), (0, {row: "Loan already exists" for row in (1, 2, 3)}))
+        self.assertEqual(Loan.objects.filter(user=self.user, disbursement_date=datetime.date(2024, 2, 1)).count(), 2)
+
+
+class LedgerExportTests(TestCase):
+    def setUp(self):
+        self.loans = [make_loan() for _ in range(2)]
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(get_user_model().objects.create_user('staff', password='x', is_staff=True))
+
+    def export(self, limit):
+        return self.client.get('/api/export/loans.ndjson', {'limit': limit})
+
+    def test_limit(self):
+        response = self.export('1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        for limit in ('-1', 'ten'):
+            with self.subTest(limit=limit):
+                response = self.export(limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {"error": "limit must be a non-negative integer"})
+
+
+class StatementTests(TestCase):
+    def setUp(self):
+        self.loan = make_loan()
+
+    def statement(self):
+        return json.loads(get_statement_json(self.loan.loan_id))
+
+    def test_payment_invalidates_the_stored_statement(self):
+        self.assertEqual(self.statement()['past_transactions'], [])
+        make_payment(self.loan.loan_id, Decimal('100.00'), payment_date=datetime.date(2024, 1, 10))
+        self.assertEqual(len(self.statement()['past_transactions']), 1)
+
+    def test_first_build_sees_a_payment_made_while_it_started(self):
+        """A payment committed between the first build's loan read and its statement row is not lost"""
+        get_or_create = LoanStatement.objects.get_or_create
+
+        def pay_first(*args, **kwargs):
+            make_payment(self.loan.loan_id, Decimal('100.00'), payment_date=datetime.date(2024, 1, 10))
+            return get_or_create(*args, **kwargs)
+
+        with mock.patch.object(LoanStatement.objects, 'get_or_create', side_effect=pay_first):
+            self.statement()
+
+        fresh = StatementResponseSerializer(build_statement(Loan.objects.get(pk=self.loan.pk))).data
+        self.assertEqual(self.statement(), json.loads(json.dumps(fresh, cls=DjangoJSONEncoder)))
+
+    def test_apply_loan_due_dates_match_the_statement(self):
+        client = Client(HTTP_HOST='localhost')
+        response = client.post('/api/apply-loan/', {
+            "unique_user_id": str(self.loan.user.unique_user_id), "loan_type": "CC", "loan_amount": "5000",
+            "interest_rate": "15", "term_period": 12, "disbursement_date": "2024-01-01",
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        due_dates = response.json()['due_dates']
+        self.assertEqual(due_dates[0], {"date": "2024-02-15", "amount_due": "211.50"})
+        statement = json.loads(get_statement_json(response.json()['loan_id']))
+        self.assertEqual(due_dates, statement['upcoming_transactions'])
+
+    def test_async_view_matches_the_stored_statement(self):
+        client = Client(HTTP_HOST='localhost')
+        response = client.get('/api/async/get-statement/', {'loan_id': str(self.loan.loan_id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.statement())
+        self.assertEqual(client.post('/api/async/get-statement/').status_code, 405)
+
+
+class ColdStartTests(SimpleTestCase):
+    """LAZY_IMPORTS=True, as vercel.json sets it"""
+
+    def test_cold_start_defers_heavy_imports_and_fits_the_budget(self):
+        modules = profile_imports('vercel_app', lazy=True)
+        imported = {module.split('.')[0] for module, _, _, _ in modules}
+        self.assertFalse(imported & {'pandas', 'numpy', 'celery'}, "heavy packages imported on a cold start")
+        total_ms = sum(self_us for _, self_us, _, _ in modules) / 1000
+        self.assertLess(total_ms, settings.COLD_START_BUDGET_MS)
+
+    def test_tasks_are_queued(self):
+        """Lazy processes have no django_celery_results, so the result backend must not need it"""
+        script = (
+            "import django; django.setup()\n"
+            "from credit_service.tasks import enqueue, calculate_credit_score\n"
+            "assert enqueue(calculate_credit_score, 'user-id') is not None, 'task was not queued'\n"
+        )
+        env = dict(os.environ, LAZY_IMPORTS='True', REDIS_URL='memory://',
+                   DJANGO_SETTINGS_MODULE='bright_credit.settings')
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+
+class QueryPlanTests(TestCase):
+    """The hot query patterns of credit_service must be planned on their indexes"""
+
+    def hot_queries(self):
+        today = datetime.date(2024, 2, 1)
+        loan_id = uuid.uuid4()
+        return [
+            (
+                'daily billing: due active loans',
+                Loan.objects.filter(status='ACTIVE', next_billing_date=today).values_list('loan_id', flat=True),
+                'loan_active_billing_idx',
+            ),
+            (
+                'accrual: keyset walk over active loans',
+                Loan.objects.filter(status='ACTIVE', loan_id__gt=loan_id).order_by('loan_id').values_list('loan_id')[:1000],
+                'loan_active_id_idx',
+            ),
+            (
+                'billing: latest bill of a loan',
+                Billing.objects.filter(loan_id=loan_id).order_by('-billing_date')[:1],
+                'billing_loan_date_idx',
+            ),
+            (
+                'billing: unbilled accruals in the billing window',
+                InterestAccrual.objects.filter(
+                    loan_id=loan_id,
+                    billing__isnull=True,
+                    accrual_date__gte=today - datetime.timedelta(days=29),
+                    accrual_date__lte=today,
+                ),
+                'accrual_unbilled_idx',
+            ),
+            (
+                'statement: payments of a loan by date',
+                Payment.objects.filter(loan_id=loan_id).order_by('payment_date'),
+                'payment_loan_date_idx',
+            ),
+        ]
+
+    def test_hot_queries_use_their_indexes(self):
+        for name, queryset, index_name in self.hot_queries():
+            with self.subTest(name):
+                plan = queryset.explain()
+                self.assertIn(index_name, plan, f"{name} is not planned on {index_name}:\n{plan}")
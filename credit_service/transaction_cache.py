@@ -0,0 +1,186 @@
+"""
+Columnar cache of the transactions file.
+
+The CSV is converted once into memory-mapped NumPy arrays sorted by
+Aadhaar number:
+
+- aadhar_ids.npy: sorted distinct Aadhaar numbers (int64)
+- offsets.npy: start of each Aadhaar number's rows in amounts.npy (int64, len + 1)
+- amounts.npy: signed transaction amounts, CREDIT positive and DEBIT negative (float64)
+
+Lookups are a binary search over aadhar_ids plus a slice of amounts, all
+reading straight from the mmapped files. manifest.json records the size and
+mtime of the source file, and the cache is rebuilt when they change.
+
+TRANSACTION_CACHE_DIR is a symlink to the current version of the cache, a
+directory next to it. A rebuild writes a new version and switches the
+symlink with one rename, so the path always resolves to a complete cache.
+Readers resolve the symlink once and read every file from that version.
+NumPy is imported on first use rather than with the module.
+"""
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+
+from .ledger import iter_transaction_chunks, normalize_aadhar
+
+MANIFEST = 'manifest.json'
+ARRAYS = ('aadhar_ids', 'offsets', 'amounts')
+
+# Arrays of the cache currently mapped by this process, keyed by cache directory
+_loaded = {}
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {'path': str(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_cache(path=None, cache_dir=None):
+    """
+    Convert the transactions file into the columnar cache.
+
+    The arrays are written to a new version directory next to cache_dir,
+    and cache_dir is then pointed at it with an atomic rename of a symlink,
+    so readers never see a missing or partially written cache.
+    """
+    import numpy as np
+
+    path = str(path or settings.TRANSACTION_CSV_PATH)
+    cache_dir = str(cache_dir or settings.TRANSACTION_CACHE_DIR)
+    signature = _source_signature(path)
+
+    aadhar_parts = []
+    amount_parts = []
+    for chunk in iter_transaction_chunks(path, 0, signature['size']):
+        amounts = chunk['Amount'].to_numpy(dtype=np.float64)
+        is_debit = (chunk['Transaction_type'] == 'DEBIT').to_numpy()
+        is_credit = (chunk['Transaction_type'] == 'CREDIT').to_numpy()
+        aadhar_parts.append(chunk['AADHAR_ID'].to_numpy(dtype=np.int64))
+        amount_parts.append(np.where(is_debit, -amounts, np.where(is_credit, amounts, 0.0)))
+
+    aadhar_column = np.concatenate(aadhar_parts) if aadhar_parts else np.empty(0, dtype=np.int64)
+    amount_column = np.concatenate(amount_parts) if amount_parts else np.empty(0, dtype=np.float64)
+
+    order = np.argsort(aadhar_column, kind='stable')
+    aadhar_column = aadhar_column[order]
+    amount_column = amount_column[order]
+
+    aadhar_ids, starts = np.unique(aadhar_column, return_index=True)
+    offsets = np.append(starts, len(aadhar_column)).astype(np.int64)
+
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.transactions-', dir=parent)
+    try:
+        np.save(os.path.join(staging, 'aadhar_ids.npy'), aadhar_ids)
+        np.save(os.path.join(staging, 'offsets.npy'), offsets)
+        np.save(os.path.join(staging, 'amounts.npy'), amount_column)
+        with open(os.path.join(staging, MANIFEST), 'w') as f:
+            json.dump({**signature, 'rows': int(len(amount_column))}, f)
+
+        previous = None
+        if os.path.islink(cache_dir):
+            previous = os.path.realpath(cache_dir)
+        elif os.path.isdir(cache_dir):
+            # Caches built before versioning are a plain directory, which a
+            # symlink cannot replace; move it aside once
+            previous = tempfile.mkdtemp(prefix='.transactions-old-', dir=parent)
+            os.replace(cache_dir, os.path.join(previous, 'cache'))
+
+        link = staging + '.link'
+        os.symlink(os.path.basename(staging), link)
+        try:
+            os.replace(link, cache_dir)
+        except OSError:
+            os.remove(link)
+            raise
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if previous and previous != staging:
+        # Processes that already mapped the old arrays keep reading them;
+        # ones that resolved the old version but had not opened it yet retry
+        shutil.rmtree(previous, ignore_errors=True)
+
+    _loaded.pop(cache_dir, None)
+    return {"rows": int(len(amount_column)), "aadhar_ids": int(len(aadhar_ids))}
+
+
+def load_cache(path=None, cache_dir=None):
+    """
+    Return the mapped cache arrays, rebuilding the cache if the source file changed.
+    """
+    import numpy as np
+
+    path = str(path or settings.TRANSACTION_CSV_PATH)
+    cache_dir = str(cache_dir or settings.TRANSACTION_CACHE_DIR)
+    signature = _source_signature(path)
+
+    loaded = _loaded.get(cache_dir)
+    if loaded and loaded['signature'] == signature:
+        return loaded['arrays']
+
+    for attempt in range(2):
+        version = os.path.realpath(cache_dir)
+        manifest = _read_manifest(version)
+        if not manifest or any(manifest.get(key) != value for key, value in signature.items()):
+            build_cache(path, cache_dir)
+            version = os.path.realpath(cache_dir)
+        try:
+            arrays = {
+                name: np.load(os.path.join(version, f'{name}.npy'), mmap_mode='r')
+                for name in ARRAYS
+            }
+            break
+        except FileNotFoundError:
+            # Another process swapped in a newer version and removed this one
+            if attempt:
+                raise
+
+    _loaded[cache_dir] = {'signature': signature, 'arrays': arrays}
+    return arrays
+
+
+def get_net_balances(aadhar_ids):
+    """
+    Return a dict of normalized Aadhaar number to CREDIT - DEBIT balance.
+
+    Same contract as ledger.get_net_balances: Aadhaar numbers without
+    transactions are left out of the result.
+    """
+    import numpy as np
+
+    arrays = load_cache()
+    sorted_ids = arrays['aadhar_ids']
+    offsets = arrays['offsets']
+    amounts = arrays['amounts']
+
+    balances = {}
+    for aadhar_id in {normalize_aadhar(aadhar_id) for aadhar_id in aadhar_ids}:
+        if not aadhar_id.isdigit():
+            continue
+        key = int(aadhar_id)
+        index = int(np.searchsorted(sorted_ids, key))
+        if index < len(sorted_ids) and sorted_ids[index] == key:
+            total = amounts[offsets[index]:offsets[index + 1]].sum()
+            balances[aadhar_id] = Decimal(repr(float(total))).quantize(Decimal('0.01'))
+    return balances
+
+
+def get_net_balance(aadhar_id):
+    """Return the CREDIT - DEBIT balance for an Aadhaar number, or None if it has no transactions"""
+    return get_net_balances([aadhar_id]).get(normalize_aadhar(aadhar_id))
@@ -1,11 +1,16 @@
 from django.urls import path
-# Import the view functions only when they're needed
-# from .views import RegisterUserView, ApplyLoanView, MakePaymentView, GetStatementView
+from .views import (
+    RegisterUserView, BulkRegisterUsersView, CreditScoreStatusView, ApplyLoanView, MakePaymentView,
+    GetStatementView, LedgerExportView, get_statement_async,
+)
 
 urlpatterns = [
-    # These endpoints will be implemented when REST Framework is available
-    # path('register-user/', RegisterUserView.as_view(), name='register-user'),
-    # path('apply-loan/', ApplyLoanView.as_view(), name='apply-loan'),
-    # path('make-payment/', MakePaymentView.as_view(), name='make-payment'),
-    # path('get-statement/', GetStatementView.as_view(), name='get-statement'),
-] 
\ No newline at end of file
+    path('register-user/', RegisterUserView.as_view(), name='register-user'),
+    path('bulk-register-users/', BulkRegisterUsersView.as_view(), name='bulk-register-users'),
+    path('credit-score-status/', CreditScoreStatusView.as_view(), name='credit-score-status'),
+    path('apply-loan/', ApplyLoanView.as_view(), name='apply-loan'),
+    path('make-payment/', MakePaymentView.as_view(), name='make-payment'),
+    path('get-statement/', GetStatementView.as_view(), name='get-statement'),
+    path('async/get-statement/', get_statement_async, name='get-statement-async'),
+    path('export/<str:table>.<str:file_format>', LedgerExportView.as_view(), name='ledger-export'),
+]
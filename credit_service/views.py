@@ -1,18 +1,33 @@
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotAllowed, StreamingHttpResponse
 from django.views import View
 from django.db import transaction
 from django.utils import timezone
 import datetime
+import json
+import uuid
 from decimal import Decimal
 
 from .models import User, Loan, Billing, Payment, InterestAccrual
-from .tasks import calculate_credit_score
+from .registration import register_users
+from .payments import make_payment, PaymentError
+from .schedule import project_loan_schedule
+from .statements import get_statement_json, aget_statement_json, StatementError
+from . import exports
+from .serializers import (
+    UserSerializer, BulkUserSerializer, PaymentSerializer, LoanApplicationSerializer, UpcomingEMISerializer,
+)
 
 # Simple views for demonstration when DRF is not available
 class RegisterUserView(View):
     pass
 
+class BulkRegisterUsersView(View):
+    pass
+
+class CreditScoreStatusView(View):
+    pass
+
 class ApplyLoanView(View):
     pass
 
@@ -21,3 +36,258 @@ class MakePaymentView(View):
 
 class GetStatementView(View):
     pass
+
+class LedgerExportView(View):
+    pass
+
+
+async def get_statement_async(request):
+    """
+    Async get-statement for ASGI servers.
+    
+    Same response as GetStatementView, but a current statement is read
+    with the async ORM, so waiting on the database does not hold a thread.
+    The method is checked here because require_GET only keeps async views
+    async from Django 5.0 on.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    
+    try:
+        loan_id = uuid.UUID(request.GET.get('loan_id', ''))
+    except ValueError:
+        return JsonResponse({"error": "A valid loan_id is required"}, status=400)
+    
+    try:
+        payload = await aget_statement_json(loan_id)
+    except StatementError as e:
+        return JsonResponse({"error": str(e)}, status=404)
+    
+    return HttpResponse(payload, content_type='application/json')
+
+# The actual implementation would be used when REST Framework is available
+try:
+    from rest_framework import status
+    from rest_framework.response import Response
+    from rest_framework.views import APIView
+    from rest_framework.exceptions import ValidationError
+    from rest_framework.permissions import IsAdminUser
+    
+    from .idempotency import idempotent
+    from django.urls import reverse
+    
+    class RegisterUserView(APIView):
+        """
+        Register a user and queue the credit score calculation.
+        
+        The response does not wait for the score; it is calculated by a
+        Celery worker once the user is committed and can be polled at
+        credit_score_status_url.
+        """
+        def post(self, request):
+            serializer = UserSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Imported here so that starting the web process does not load Celery
+            from .tasks import calculate_credit_score, enqueue
+            
+            with transaction.atomic():
+                user = serializer.save()
+                # Queue only after commit so the worker can see the new row
+                transaction.on_commit(lambda: enqueue(calculate_credit_score, str(user.unique_user_id)))
+            
+            return Response({
+                "error": None,
+                "unique_user_id": user.unique_user_id,
+                "credit_score_status_url": f"{reverse('credit-score-status')}?unique_user_id={user.unique_user_id}",
+            })
+    
+    class BulkRegisterUsersView(APIView):
+        """
+        Register many users in one request.
+        
+        The body is either a JSON array of users or NDJSON (one user per
+        line, sent as application/x-ndjson). An NDJSON body is read line by
+        line without loading the whole upload. Rows are numbered from 0 in
+        upload order. Invalid or duplicate rows are reported by row number
+        and do not stop the other rows from being registered. One batched
+        scoring job is queued for all new users.
+        """
+        def post(self, request):
+            if request.content_type.startswith('application/x-ndjson'):
+                records = self._ndjson_records(request)
+            elif isinstance(request.data, list):
+                records = ((row, data, None) for row, data in enumerate(request.data))
+            else:
+                return Response(
+                    {"error": "Expected a JSON array or an application/x-ndjson body"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            child = BulkUserSerializer(many=True).child
+            errors = {}
+            
+            def valid_rows():
+                for row, data, error in records:
+                    if error:
+                        errors[row] = {"non_field_errors": [error]}
+                        continue
+                    try:
+                        yield row, child.run_validation(data)
+                    except ValidationError as e:
+                        errors[row] = e.detail
+            
+            created, insert_errors = register_users(valid_rows())
+            errors.update(insert_errors)
+            
+            user_ids = [str(user.unique_user_id) for _, user in created]
+            if user_ids:
+                from .tasks import score_users_batch, enqueue
+                transaction.on_commit(lambda: enqueue(score_users_batch, user_ids))
+            
+            return Response({
+                "error": None,
+                "created": len(created),
+                "failed": len(errors),
+                "users": [{"row": row, "unique_user_id": user.unique_user_id} for row, user in created],
+                "errors": [{"row": row, "error": errors[row]} for row in sorted(errors)],
+            })
+        
+        @staticmethod
+        def _ndjson_records(request):
+            """Yield (row, data, error) for each non-blank line of an NDJSON body"""
+            if request.stream is None:
+                return
+            row = 0
+            for line in request.stream:
+                if not line.strip():
+                    continue
+                try:
+                    yield row, json.loads(line), None
+                except ValueError:
+                    yield row, None, "Invalid JSON"
+                row += 1
+    
+    class CreditScoreStatusView(APIView):
+        """
+        Report whether a user's credit score has been calculated.
+        
+        Read straight from the user row, so polling costs one primary key lookup.
+        """
+        def get(self, request):
+            try:
+                user_id = uuid.UUID(request.query_params.get('unique_user_id', ''))
+            except ValueError:
+                return Response({"error": "A valid unique_user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            row = User.objects.filter(unique_user_id=user_id).values_list('credit_score').first()
+            if row is None:
+                return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+            
+            credit_score = row[0]
+            return Response({
+                "error": None,
+                "unique_user_id": user_id,
+                "status": "PENDING" if credit_score is None else "READY",
+                "credit_score": credit_score,
+            })
+    
+    class ApplyLoanView(APIView):
+        """
+        Apply for a credit card loan and return its projected due dates.
+        """
+        @idempotent('apply-loan')
+        def post(self, request):
+            serializer = LoanApplicationSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            
+            data = serializer.validated_data
+            loan = Loan.objects.create(
+                user=data['user'],
+                loan_type=data['loan_type'],
+                loan_amount=data['loan_amount'],
+                interest_rate=data['interest_rate'],
+                term_period=data['term_period'],
+                disbursement_date=data['disbursement_date'],
+                principal_balance=data['loan_amount']
+            )
+            
+            return Response({
+                "error": None,
+                "loan_id": loan.loan_id,
+                # Same representation as the statement's upcoming_transactions
+                "due_dates": UpcomingEMISerializer(project_loan_schedule(loan), many=True).data,
+            })
+    
+    class MakePaymentView(APIView):
+        """
+        Record a payment towards a loan; past dues are paid first.
+        """
+        @idempotent('make-payment')
+        def post(self, request):
+            serializer = PaymentSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                make_payment(serializer.validated_data['loan_id'], serializer.validated_data['amount'])
+            except PaymentError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+            return Response({"error": None})
+    
+    class GetStatementView(APIView):
+        """
+        Return a loan's past transactions and upcoming dues.
+        
+        Served from the materialized statement; the JSON is only rebuilt
+        after a payment or billing changed it.
+        """
+        def get(self, request):
+            try:
+                loan_id = uuid.UUID(request.query_params.get('loan_id', ''))
+            except ValueError:
+                return Response({"error": "A valid loan_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                payload = get_statement_json(loan_id)
+            except StatementError as e:
+                return Response({"error": str(e)}, status=status.HTTP_404_NOT_FOUND)
+            
+            return HttpResponse(payload, content_type='application/json')
+    
+    class LedgerExportView(APIView):
+        """
+        Stream a ledger table as NDJSON or CSV for reconciliation.
+        
+        Rows are ordered by (date, ID). A pull is resumed with
+        ?after_date=&after_id= set to the last row received; ?limit= caps
+        the number of rows in one response. Staff only.
+        """
+        permission_classes = [IsAdminUser]
+        
+        def get(self, request, table, file_format):
+            if file_format not in exports.FORMATS:
+                return Response({"error": f"Unknown format '{file_format}'"}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                export, after_date, after_id = exports.parse_cursor(
+                    table, request.query_params.get('after_date'), request.query_params.get('after_id')
+                )
+                limit = int(request.query_params.get('limit') or 0)
+                if limit < 0:
+                    raise ValueError(limit)
+            except exports.ExportError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            except ValueError:
+                return Response({"error": "limit must be a non-negative integer"}, status=status.HTTP_400_BAD_REQUEST)
+            
+            rows = exports.export_rows(export, after_date, after_id, limit=limit)
+            content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+            response = StreamingHttpResponse(exports.render(export, rows, file_format), content_type=content_type)
+            response['Content-Disposition'] = f'attachment; filename="{table}.{file_format}"'
+            return response
+
+except ImportError:
+    pass